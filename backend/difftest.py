@@ -0,0 +1,273 @@
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import scheduler
+
+# Differential test: feed the same random command stream to every Python
+# engine and to the compiled C backend, compare the answers line by line
+# and report throughput relative to the default engine.
+#
+#   python backend/difftest.py [--seed N] [--commands N] [--rounds N] [--exe path]
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PY_PATH = os.path.join(BACKEND_DIR, "scheduler.py")
+C_PATH = os.path.join(BACKEND_DIR, "scheduler.c")
+
+# Commands scheduler.c understands with the same semantics as scheduler.py.
+# UNDO is left out: scheduler.c only undoes ADDs, scheduler.py journals every mutation.
+REFERENCE_COMMANDS = {"ADD", "DELETE", "SUGGEST", "GET", "ALERT", "SET_LIMIT"}
+
+# Keep the stream small enough for scheduler.c: GET writes into a 4 KB buffer
+# and ALERT prints its answer as a short.
+DOCTORS = 3
+DAYS = 4
+BASE_DAY = 739000
+
+
+def gen_commands(rng, n):
+    cmds = []
+    ids = []
+    next_id = 1
+    for _ in range(n):
+        doc = rng.randrange(DOCTORS)
+        day = (BASE_DAY + rng.randrange(DAYS)) * 1440
+        r = rng.random()
+        if r < 0.45:
+            start = day + rng.randrange(420, 1260, 15)
+            dur = rng.choice([15, 30, 45, 60, 90, 120])
+            type_id = rng.randrange(3)
+            break_type = rng.randrange(3) if type_id == 1 else 3
+            cmds.append(f"ADD {doc} {start} {dur} {type_id} {break_type} Patient_{rng.randrange(100)}")
+            # Ids are global, so a guess is good enough; misses exercise the no-op path
+            ids.append(next_id)
+            next_id += 1
+        elif r < 0.52 and ids:
+            cmds.append(f"DELETE {doc} {rng.choice(ids)}")
+        elif r < 0.55 and ids:
+            start = day + rng.randrange(420, 1260, 15)
+            dur = rng.choice(["", " 30", " 60"])
+            cmds.append(f"MOVE {doc} {rng.choice(ids)} {start}{dur}")
+        elif r < 0.62:
+            cmds.append(f"UNDO {doc} {rng.randrange(1, 4)}")
+        elif r < 0.65:
+            cmds.append(f"REDO {doc} {rng.randrange(1, 4)}")
+        elif r < 0.75:
+            cmds.append(f"SUGGEST {doc} {rng.choice([15, 30, 60])} {day}")
+        elif r < 0.85:
+            cmds.append(f"ALERT {doc} {day + rng.randrange(0, 1440, 5)}")
+        elif r < 0.87:
+            cmds.append(f"SET_LIMIT {doc} {rng.choice([240, 480, 720])}")
+        elif r < 0.88:
+            cmds.append(f"WATCH {doc} {rng.choice([15, 30, 60])}")
+        elif r < 0.90:
+            cmds.append(f"TICK {day + rng.randrange(0, 1440, 5)}")
+        elif r < 0.902:
+            cmds.append(f"COMPACT {day}")
+        elif r < 0.91:
+            cmds.append(f"COLD {doc} {day - 1440} {day + 1440}")
+        elif r < 0.915:
+            start = day + rng.randrange(420, 1260, 15)
+            cmds.append(f"OVERLAPS {doc} {start} {start + rng.choice([15, 60, 240])}")
+        elif r < 0.92:
+            cmds.append(f"UTIL {doc} {BASE_DAY - 1} {BASE_DAY + rng.randrange(DAYS + 1)}")
+        elif r < 0.93:
+            cmds.append(f"GET_PAGE {doc} {day + rng.randrange(0, 1440, 15)} - {rng.randrange(1, 6)}")
+        elif r < 0.94:
+            cmds.append(f"NEXT_OPEN {doc} {day + rng.randrange(0, 1440, 15)} {rng.choice([15, 60, 240])}")
+        elif r < 0.95:
+            who = rng.choice([str(doc), "*"])
+            window = rng.choice(["", f" {day} {day + 1440}"])
+            cmds.append(f"SEARCH {who} {rng.choice(['pat', 'PATIENT', '1', '42', 'x'])}{window}")
+        else:
+            cmds.append(f"GET {doc}")
+    return cmds
+
+
+def normalize(cmd, line, strict):
+    verb = cmd.split()[0]
+    if verb == "GET":
+        try:
+            events = json.loads(line)
+        except ValueError:
+            return line
+        # scheduler.c lists events in heap order
+        return sorted((e["start"], e["id"], e["duration"], e["type"], e["break"], e["desc"]) for e in events)
+    if not strict and line.startswith("COLLISION"):
+        # Which overlapping interval gets reported depends on the tree shape
+        return "COLLISION"
+    return line
+
+
+def run(argv, cmds):
+    payload = "\n".join(cmds + ["EXIT"]) + "\n"
+    t0 = time.perf_counter()
+    proc = subprocess.run(argv, input=payload, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    return proc.stdout.splitlines(), elapsed
+
+
+def compare(name, cmds, expected, got, strict):
+    if strict:
+        # Python engines must agree byte for byte, pushed alert lines included
+        for i, (a, b) in enumerate(zip(expected, got)):
+            if a != b:
+                print(f"  {name}: mismatch at output line {i}")
+                print(f"    {scheduler.DEFAULT_ENGINE}: {a}")
+                print(f"    {name}: {b}")
+                return False
+        return len(got) == len(expected)
+
+    if len(got) != len(expected):
+        print(f"  {name}: {len(got)} responses, expected {len(expected)}")
+    for i, (cmd, a, b) in enumerate(zip(cmds, expected, got)):
+        if normalize(cmd, a, strict) != normalize(cmd, b, strict):
+            print(f"  {name}: mismatch at command {i}: {cmd}")
+            print(f"    {scheduler.DEFAULT_ENGINE}: {a}")
+            print(f"    {name}: {b}")
+            return False
+    return len(got) == len(expected)
+
+
+def check_replay(ref):
+    # A trace recorded in-process (UNDO and a command scheduler.c lacks included)
+    # replayed on scheduler.c must stay one answer per command, in step with scheduler.py
+    import replay
+    day = (BASE_DAY + 1) * 1440
+    calls = [
+        ("add_event", (0, day + 540, 30, 0, 3, "Patient_1")),
+        ("add_event", (0, day + 600, 30, 0, 3, "Patient_2")),
+        ("undo", (0, 1)),
+        ("get_all", (0,)),
+        ("watch", (0, 30, day)),
+        ("add_event", (0, day + 660, 60, 0, 3, "Patient_3")),
+        ("undo", (0, 1)),
+        ("get_all", (0,)),
+        ("suggest", (0, 30, day)),
+    ]
+    path = os.path.join(tempfile.mkdtemp(), "trace.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for i, (method, args) in enumerate(calls):
+            f.write(json.dumps({"ts": i, "cmd": scheduler.command_line(method, args)}) + "\n")
+
+    py = replay.ProcessTarget([sys.executable, PY_PATH, "--manual-clock"])
+    c = replay.ProcessTarget([ref])
+    ok = True
+    for _, cmd in replay.load_trace(path):
+        a, b = py.send(cmd), c.send(cmd)
+        if cmd.split()[0] not in REFERENCE_COMMANDS | {"UNDO"}:
+            b = a if b == "ERROR" else b
+        if ok and normalize(cmd, a, False) != normalize(cmd, b, False):
+            print(f"  replay on scheduler.c: mismatch at {cmd}")
+            print(f"    scheduler.py: {a}")
+            print(f"    scheduler.c: {b}")
+            ok = False
+    py.close()
+    c.close()
+    return ok
+
+
+def check_refusals():
+    # Commands scheduler.py must answer ERROR without changing any state: the
+    # probes after each one must read the same as when it was never sent
+    day = (BASE_DAY + 1) * 1440
+    setup = [f"ADD 0 {day + 540} 30 0 3 Patient_1", f"ADD 0 {day + 600} 30 0 3 Patient_2"]
+    probes = ["GET 0", "SEARCH 0 pat", f"UTIL 0 {BASE_DAY} {BASE_DAY + 2}",
+              f"NEXT_OPEN 0 {day} 30", f"SUGGEST 0 30 {day}", "UNDO 0", "GET 0"]
+    refused = [
+        f"MOVE 0 1 {10 ** 13}",
+        f"UTIL 0 0 {BASE_DAY}",
+    ]
+    ok = True
+    for name in scheduler.ENGINES:
+        argv = [sys.executable, PY_PATH, "--engine", name, "--manual-clock"]
+        expected, _ = run(argv, setup + probes)
+        for cmd in refused:
+            got, _ = run(argv, setup + [cmd] + probes)
+            answer = got[len(setup)] if len(got) > len(setup) else None
+            if answer != "ERROR" or got[:len(setup)] + got[len(setup) + 1:] != expected:
+                print(f"  {name}: {cmd} answered {answer} or changed state")
+                ok = False
+    return ok
+
+
+def build_reference(exe):
+    if exe:
+        return exe if os.path.exists(exe) else None
+    exe = os.path.join(BACKEND_DIR, "scheduler.exe")
+    if os.path.exists(exe):
+        return exe
+    gcc = shutil.which("gcc")
+    if not gcc:
+        return None
+    out = os.path.join(tempfile.mkdtemp(), "scheduler_ref")
+    if subprocess.run([gcc, "-O2", "-o", out, C_PATH]).returncode != 0:
+        return None
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential test of scheduler backends")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--commands", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--exe", help="compiled scheduler.c (built with gcc if omitted)")
+    args = parser.parse_args()
+
+    ref = build_reference(args.exe)
+    if not ref:
+        print("scheduler.c reference not available, comparing Python engines only")
+
+    names = [scheduler.DEFAULT_ENGINE] + [n for n in scheduler.ENGINES if n != scheduler.DEFAULT_ENGINE]
+    timings = {n: 0.0 for n in names}
+    counts = {n: 0 for n in names}
+    if ref:
+        timings["scheduler.c"] = 0.0
+        counts["scheduler.c"] = 0
+    ok = True
+
+    for r in range(args.rounds):
+        rng = random.Random(args.seed + r)
+        cmds = gen_commands(rng, args.commands)
+
+        outputs = {}
+        for name in names:
+            outputs[name], elapsed = run([sys.executable, PY_PATH, "--engine", name, "--manual-clock"], cmds)
+            timings[name] += elapsed
+            counts[name] += len(cmds)
+
+        base = outputs[names[0]]
+        for name in names[1:]:
+            ok = compare(name, cmds, base, outputs[name], strict=True) and ok
+
+        if ref:
+            ref_cmds = [c for c in cmds if c.split()[0] in REFERENCE_COMMANDS]
+            if ref_cmds != cmds:
+                base, _ = run([sys.executable, PY_PATH, "--engine", names[0], "--manual-clock"], ref_cmds)
+            out, elapsed = run([ref], ref_cmds)
+            timings["scheduler.c"] += elapsed
+            counts["scheduler.c"] += len(ref_cmds)
+            ok = compare("scheduler.c", ref_cmds, base, out, strict=False) and ok
+
+    ok = check_refusals() and ok
+    if ref:
+        ok = check_replay(ref) and ok
+
+    total = args.commands * args.rounds
+    print(f"{total} commands x {len(timings)} backends, seed {args.seed}")
+    base_rate = counts[names[0]] / timings[names[0]]
+    for name, secs in timings.items():
+        rate = counts[name] / secs
+        print(f"  {name:12s} {rate:10.0f} cmd/s  {rate / base_rate:5.2f}x")
+    print("OK" if ok else "MISMATCH")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+
+import scheduler
+from difftest import PY_PATH, build_reference
+
+# Replay a recorded command trace (see SCHEDULER_TRACE in frontend/app.py)
+# against a backend and report throughput and latency percentiles.
+#
+#   python backend/replay.py TRACE [--target py|c|inprocess] [--engine NAME]
+#                           [--speed X] [--streams N] [--live-clock] [--exe path]
+#
+# --speed 1 keeps the recorded gaps, 10 replays ten times faster, 0 sends
+# back to back. Each stream replays the whole trace: py and c streams get
+# a backend process each, inprocess streams share one Scheduler (and its lock).
+
+PUSH_LINES = ("ALERT_PUSH", "ALERT_CANCEL")
+PERCENTILES = (50, 90, 99)
+
+
+def load_trace(path):
+    # One JSON object per line; bare protocol lines replay with no gaps
+    trace = []
+    first = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+                ts, cmd = rec["ts"], rec["cmd"]
+            except (ValueError, KeyError, TypeError):
+                ts, cmd = None, line
+            if cmd.split()[0] == "EXIT":
+                continue
+            if first is None and ts is not None:
+                first = ts
+            trace.append(((ts - first) if ts is not None else 0.0, cmd))
+    return trace
+
+
+class ProcessTarget:
+    def __init__(self, argv):
+        self.proc = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     text=True, bufsize=1)
+        # Wait for start-up so the first timed command doesn't pay for it
+        self.send("GET 0")
+
+    def send(self, cmd):
+        self.proc.stdin.write(cmd + "\n")
+        self.proc.stdin.flush()
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                raise RuntimeError(f"backend exited on: {cmd}")
+            # Alerts pushed by the clock thread are not answers
+            if not line.startswith(PUSH_LINES):
+                return line.rstrip("\n")
+
+    def close(self):
+        self.proc.stdin.write("EXIT\n")
+        self.proc.stdin.close()
+        self.proc.wait()
+
+
+class InProcessTarget:
+    def __init__(self, sched):
+        self.sched = sched
+
+    def send(self, cmd):
+        parts = cmd.split()
+        # A failing command answers ERROR, as scheduler.py's main() does
+        try:
+            # Snapshot reads don't take the lock, as in the frontend
+            if parts[0] in scheduler.READ_COMMANDS:
+                return scheduler.execute(self.sched, parts)
+            with self.sched.lock:
+                return scheduler.execute(self.sched, parts)
+        except Exception:
+            return "ERROR"
+
+    def close(self):
+        pass
+
+
+def replay(target, trace, speed, t0, samples):
+    # Latency is measured from the scheduled send time, so a backend that
+    # falls behind is charged for the queueing it causes.
+    for offset, cmd in trace:
+        due = t0 + offset / speed if speed else time.perf_counter()
+        wait = due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        resp = target.send(cmd)
+        samples.append((cmd.split()[0], time.perf_counter() - due, resp == "ERROR"))
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, len(sorted_values) * p // 100)]
+
+
+def report(samples, elapsed):
+    print(f"{len(samples)} commands in {elapsed:.2f}s, {len(samples) / elapsed:.0f} cmd/s")
+    errors = sum(1 for _, _, err in samples if err)
+    if errors:
+        print(f"  {errors} ERROR responses")
+
+    by_verb = {"all": []}
+    for verb, latency, _ in samples:
+        by_verb.setdefault(verb, []).append(latency)
+        by_verb["all"].append(latency)
+
+    header = "".join(f"{'p' + str(p):>10s}" for p in PERCENTILES)
+    print(f"  {'verb':10s}{'count':>8s}{header}{'max':>10s}   (us)")
+    for verb in sorted(by_verb, key=lambda v: (v != "all", v)):
+        values = sorted(by_verb[verb])
+        cols = "".join(f"{percentile(values, p) * 1e6:10.0f}" for p in PERCENTILES)
+        print(f"  {verb:10s}{len(values):8d}{cols}{values[-1] * 1e6:10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a scheduler command trace")
+    parser.add_argument("trace")
+    parser.add_argument("--target", choices=["py", "c", "inprocess"], default="py")
+    parser.add_argument("--engine", default=scheduler.DEFAULT_ENGINE, choices=sorted(scheduler.ENGINES))
+    parser.add_argument("--speed", type=float, default=0, help="1 = recorded pace, 0 = as fast as possible")
+    parser.add_argument("--streams", type=int, default=1)
+    parser.add_argument("--live-clock", action="store_true", help="run the alert clock (py and inprocess)")
+    parser.add_argument("--exe", help="compiled scheduler.c (built with gcc if omitted)")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    if not trace:
+        print("empty trace")
+        return 1
+
+    if args.target == "c":
+        exe = build_reference(args.exe)
+        if not exe:
+            print("scheduler.c not available")
+            return 1
+        targets = [ProcessTarget([exe]) for _ in range(args.streams)]
+    elif args.target == "py":
+        argv = [sys.executable, PY_PATH, "--engine", args.engine]
+        if not args.live_clock:
+            argv.append("--manual-clock")
+        targets = [ProcessTarget(argv) for _ in range(args.streams)]
+    else:
+        sched = scheduler.Scheduler(args.engine)
+        if args.live_clock:
+            sched.start_clock()
+        targets = [InProcessTarget(sched) for _ in range(args.streams)]
+
+    samples = [[] for _ in targets]
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=replay, args=(t, trace, args.speed, t0, s))
+               for t, s in zip(targets, samples)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    for t in targets:
+        t.close()
+
+    print(f"{args.target} ({args.engine if args.target != 'c' else 'scheduler.c'}), "
+          f"{args.streams} stream(s), speed {args.speed or 'max'}")
+    report([x for s in samples for x in s], elapsed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -435,6 +435,12 @@ int main() {
         else if (strcmp(command, "EXIT") == 0) {
             break;
         }
+        else {
+            /* Unknown command (e.g. REDO from the Python protocol): skip the line so the caller doesn't hang */
+            int c;
+            while ((c = getchar()) != '\n' && c != EOF);
+            printf("ERROR\n");
+        }
     }
     return 0;
 }
@@ -1,11 +1,27 @@
+import os
 import sys
 import json
+import time
+import queue
+import heapq
+import bisect
+import struct
+import tempfile
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from collections import deque
 
 # Constants
 MAX_EVENTS_TOTAL = 1000
 MAX_EVENTS_DAILY_LIMIT = 7
 MAX_DOCTORS = 100
 HASH_SIZE = 1000
+JOURNAL_DEPTH = 50 # Undo/redo steps kept per doctor
+UTIL_MAX_DAYS = 366 # Longest UTIL range; the per-day list is built under the lock
+WORK_START = 480 # 8:00 AM, minutes into the day
+WORK_END = 1200  # 8:00 PM
 
 # Enums
 EVENT_PATIENT = 0
@@ -30,14 +46,6 @@ class Event:
         self.description = description
         self.next_in_hash = None
 
-# Global State
-global_event_id = 1
-# vector<Event> heaps[MAX_DOCTORS]
-upcoming_heaps = {i: [] for i in range(MAX_DOCTORS)}
-# undo_stack[MAX_DOCTORS] = list of event_ids
-undo_stacks = {i: [] for i in range(MAX_DOCTORS)}
-# map[doctor_id][key] = list of Events
-event_hash_map = {i: {} for i in range(MAX_DOCTORS)}
 # ITNode
 class ITNode:
     def __init__(self, event):
@@ -46,26 +54,6 @@ class ITNode:
         self.left = None
         self.right = None
 
-interval_trees = {i: None for i in range(MAX_DOCTORS)}
-daily_limits = {i: 480 for i in range(MAX_DOCTORS)} # Default 8 hours
-
-
-# --- Helpers ---
-
-def get_events_on_day(doctor_id, day_start, day_end):
-    count = 0
-    for e in upcoming_heaps[doctor_id]:
-        if e.start_time >= day_start and e.start_time < day_end:
-            count += 1
-    return count
-
-def get_total_duration_on_day(doctor_id, day_start, day_end):
-    total = 0
-    for e in upcoming_heaps[doctor_id]:
-        if e.start_time >= day_start and e.start_time < day_end:
-            total += e.duration
-    return total
-
 
 # --- Interval Tree ---
 
@@ -88,224 +76,1222 @@ def check_collision(root, start, end):
         return None
     # Overlap condition: start < node.end && end > node.start
     # Node interval: [root.event.start_time, root.event.end_time)
-    if root.event.start_time < end and root.event.end_time > start:
-        return root
-    
+    # Left subtree first so the earliest overlapping event is reported.
+    # If left.max > start but nothing on the left overlaps, nothing on the right can either.
     if root.left and root.left.max > start:
         return check_collision(root.left, start, end)
+
+    if root.event.start_time < end and root.event.end_time > start:
+        return root
     
     return check_collision(root.right, start, end)
 
-# --- Logic ---
-
-def add_event(doctor_id, start, duration, type_id, break_type, desc):
-    global global_event_id
-    
-    # Global Limit
-    if len(upcoming_heaps[doctor_id]) >= MAX_EVENTS_TOTAL:
-        print("MAX_EVENTS")
+def it_overlaps(root, start, end, out):
+    # In-order walk, so `out` comes back ordered by start. A subtree is skipped when
+    # nothing in it ends after `start` (max), and the right side once the node starts
+    # at or after `end`: O(h + k) for k overlaps.
+    if root is None or root.max <= start:
         return
+    it_overlaps(root.left, start, end, out)
+    if root.event.start_time < end:
+        if root.event.end_time > start:
+            out.append(root.event)
+        it_overlaps(root.right, start, end, out)
 
-    # Daily Limit
-    day_start = (start // 1440) * 1440
-    day_end = day_start + 1440
-    if get_events_on_day(doctor_id, day_start, day_end) >= MAX_EVENTS_DAILY_LIMIT:
-        print("MAX_EVENTS")
-        return
+def it_update_max(node):
+    node.max = node.event.end_time
+    if node.left and node.left.max > node.max:
+        node.max = node.left.max
+    if node.right and node.right.max > node.max:
+        node.max = node.right.max
 
-    # Time Limit
-    curr_duration = get_total_duration_on_day(doctor_id, day_start, day_end)
-    if curr_duration + duration > daily_limits[doctor_id]:
-        print("TIME_LIMIT")
-        return
+def it_delete(root, event):
+    # Removes the node holding `event` in place, fixing max on the way back up
+    if root is None:
+        return None
+    if root.event is event:
+        if root.left is None:
+            return root.right
+        if root.right is None:
+            return root.left
+        # Two children: pull up the in-order successor
+        succ = root.right
+        while succ.left:
+            succ = succ.left
+        root.event = succ.event
+        root.right = it_delete(root.right, succ.event)
+    elif event.start_time < root.event.start_time:
+        root.left = it_delete(root.left, event)
+    else:
+        root.right = it_delete(root.right, event)
+    it_update_max(root)
+    return root
 
 
-    end = start + duration
-    
-    # Collision
-    col_node = check_collision(interval_trees[doctor_id], start, end)
-    if col_node:
-        print(f"COLLISION {col_node.event.start_time} {col_node.event.end_time}")
-        return
+# --- Engines ---
+# An engine owns the per-doctor event structures. The command layer below only
+# talks to this interface, so engines can be swapped (--engine) and checked
+# against each other with difftest.py.
 
-    # Insert
-    eid = global_event_id
-    global_event_id += 1
-    
-    new_event = Event(eid, doctor_id, start, duration, type_id, break_type, desc)
-    
-    # 1. Heap (Just a list sorted later or maintained? C used explicit heap logic. 
-    # Python list + sort is easiest, or just append since we iterate mostly)
-    upcoming_heaps[doctor_id].append(new_event)
-    # Maintain heap property? C implementation sorts by start_time.
-    upcoming_heaps[doctor_id].sort(key=lambda x: x.start_time)
-    
-    # 2. Hash
-    key = eid % HASH_SIZE
-    if key not in event_hash_map[doctor_id]:
-        event_hash_map[doctor_id][key] = []
-    event_hash_map[doctor_id][key].append(new_event)
-    
-    # 3. Interval Tree
-    interval_trees[doctor_id] = it_insert(interval_trees[doctor_id], new_event)
-    
-    # 4. Stack
-    undo_stacks[doctor_id].append(eid)
-    
-    print("OK")
-
-def suggest(doctor_id, duration, day_start):
-    # 8:00 AM (480) to 8:00 PM (1200)
-    for t in range(480, 1201, 15):
-        global_t = day_start + t
-        if not check_collision(interval_trees[doctor_id], global_t, global_t + duration):
-            print(f"SUGGESTION {global_t}")
+class Engine:
+    name = None
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        # All events ordered by start time
+        raise NotImplementedError
+
+    def insert(self, event):
+        raise NotImplementedError
+
+    def remove(self, event_id):
+        # Returns the removed Event or None
+        raise NotImplementedError
+
+    def get(self, event_id):
+        raise NotImplementedError
+
+    def overlap(self, start, end):
+        # Earliest event overlapping [start, end) or None
+        raise NotImplementedError
+
+    def overlaps(self, start, end):
+        # Every event overlapping [start, end), ordered by start time
+        raise NotImplementedError
+
+    def next_after(self, t):
+        # Earliest event with start_time >= t or None
+        raise NotImplementedError
+
+    def range(self, lo, hi):
+        # Events with lo <= start_time < hi, ordered by start time
+        raise NotImplementedError
+
+    def page(self, start, event_id, limit):
+        # Up to `limit` events ordered after the key (start, event_id)
+        raise NotImplementedError
+
+    def copy(self):
+        # Fresh engine of the same kind holding copies of every event (see Snapshot).
+        # Inserted median-first, so the interval tree comes out balanced.
+        events = [Event(e.id, e.doctor_id, e.start_time, e.duration, e.type, e.break_type, e.description)
+                  for e in self]
+        clone = type(self)()
+        pending = deque([(0, len(events))])
+        while pending:
+            lo, hi = pending.popleft()
+            if lo < hi:
+                mid = (lo + hi) // 2
+                clone.insert(events[mid])
+                pending.append((lo, mid))
+                pending.append((mid + 1, hi))
+        return clone
+
+
+class IntervalTreeEngine(Engine):
+    # Original layout: sorted "heap" list + hash buckets + interval tree
+    name = "tree"
+
+    def __init__(self):
+        self.heap = []
+        self.heap_keys = []
+        self.hash_map = {}
+        self.tree = None
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __iter__(self):
+        return iter(self.heap)
+
+    def insert(self, event):
+        # 1. Heap: list kept sorted by (start_time, id) like the C heap's ordering
+        key = (event.start_time, event.id)
+        i = bisect.bisect_left(self.heap_keys, key)
+        self.heap_keys.insert(i, key)
+        self.heap.insert(i, event)
+
+        # 2. Hash
+        key = event.id % HASH_SIZE
+        if key not in self.hash_map:
+            self.hash_map[key] = []
+        self.hash_map[key].append(event)
+
+        # 3. Interval Tree
+        self.tree = it_insert(self.tree, event)
+
+    def remove(self, event_id):
+        # Remove from Hash
+        tgt = self.get(event_id)
+        if tgt is None:
+            return None
+        self.hash_map[event_id % HASH_SIZE].remove(tgt)
+
+        # Remove from Heap
+        i = bisect.bisect_left(self.heap_keys, (tgt.start_time, tgt.id))
+        del self.heap_keys[i]
+        del self.heap[i]
+
+        # Remove from Interval Tree (no rebuild)
+        self.tree = it_delete(self.tree, tgt)
+        return tgt
+
+    def get(self, event_id):
+        for e in self.hash_map.get(event_id % HASH_SIZE, []):
+            if e.id == event_id:
+                return e
+        return None
+
+    def overlap(self, start, end):
+        node = check_collision(self.tree, start, end)
+        return node.event if node else None
+
+    def overlaps(self, start, end):
+        out = []
+        it_overlaps(self.tree, start, end, out)
+        return out
+
+    def next_after(self, t):
+        i = bisect.bisect_left(self.heap_keys, (t,))
+        return self.heap[i] if i < len(self.heap) else None
+
+    def range(self, lo, hi):
+        i = bisect.bisect_left(self.heap_keys, (lo,))
+        j = bisect.bisect_left(self.heap_keys, (hi,))
+        return self.heap[i:j]
+
+    def page(self, start, event_id, limit):
+        i = bisect.bisect_right(self.heap_keys, (start, event_id))
+        return self.heap[i:i + limit]
+
+
+class SortedEngine(Engine):
+    # Events kept in a list sorted by (start_time, id); lookups are bisections
+    name = "sorted"
+
+    def __init__(self):
+        self.keys = []
+        self.events = []
+        self.by_id = {}
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def insert(self, event):
+        key = (event.start_time, event.id)
+        i = bisect.bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.events.insert(i, event)
+        self.by_id[event.id] = event
+
+    def remove(self, event_id):
+        event = self.by_id.pop(event_id, None)
+        if event is None:
+            return None
+        i = bisect.bisect_left(self.keys, (event.start_time, event.id))
+        del self.keys[i]
+        del self.events[i]
+        return event
+
+    def get(self, event_id):
+        return self.by_id.get(event_id)
+
+    def overlap(self, start, end):
+        # Stored events never overlap each other, so only the predecessor
+        # can straddle `start`; after that scan forward while events begin before `end`.
+        i = bisect.bisect_left(self.keys, (start,))
+        if i > 0 and self.events[i - 1].end_time > start:
+            return self.events[i - 1]
+        while i < len(self.events) and self.events[i].start_time < end:
+            if self.events[i].end_time > start:
+                return self.events[i]
+            i += 1
+        return None
+
+    def overlaps(self, start, end):
+        # Same reasoning as overlap(): predecessor, then the run starting before `end`
+        i = bisect.bisect_left(self.keys, (start,))
+        out = []
+        if i > 0 and self.events[i - 1].end_time > start:
+            out.append(self.events[i - 1])
+        while i < len(self.events) and self.events[i].start_time < end:
+            if self.events[i].end_time > start:
+                out.append(self.events[i])
+            i += 1
+        return out
+
+    def next_after(self, t):
+        i = bisect.bisect_left(self.keys, (t,))
+        return self.events[i] if i < len(self.events) else None
+
+    def range(self, lo, hi):
+        i = bisect.bisect_left(self.keys, (lo,))
+        j = bisect.bisect_left(self.keys, (hi,))
+        return self.events[i:j]
+
+    def page(self, start, event_id, limit):
+        i = bisect.bisect_right(self.keys, (start, event_id))
+        return self.events[i:i + limit]
+
+
+ENGINES = {cls.name: cls for cls in (IntervalTreeEngine, SortedEngine)}
+DEFAULT_ENGINE = "tree"
+
+
+# --- Journal ---
+# Every mutation records its inverse so UNDO/REDO replay it directly against
+# the engine instead of rebuilding anything.
+#   ("ADD", event)            undo: remove event      redo: insert it again
+#   ("DELETE", event)         undo: insert it again   redo: remove event
+#   ("SET_LIMIT", old, new)   undo: limit = old       redo: limit = new
+#   ("MOVE", event, (old_start, old_duration), (new_start, new_duration))
+
+class Journal:
+    def __init__(self, depth):
+        # Oldest entries fall off once `depth` is reached
+        self.undo_ops = deque(maxlen=depth)
+        self.redo_ops = deque(maxlen=depth)
+
+    def record(self, op):
+        self.undo_ops.append(op)
+        self.redo_ops.clear()
+
+    def clear(self):
+        self.undo_ops.clear()
+        self.redo_ops.clear()
+
+
+# --- Day Totals ---
+# Per-doctor event count and booked minutes per day (start // 1440), kept in two
+# Fenwick trees so any day range sums in O(log n), plus a dict for O(1) reads of
+# a single day. The trees are sparse: dicts over a fixed span of day ordinals, so
+# memory follows the days actually booked, however far apart they are.
+
+DAY_SPAN = 1 << 32 # Fenwick index i covers day i - DAY_SPAN // 2 - 1
+
+class DayTotals:
+    def __init__(self):
+        self.per_day = {}   # day -> [count, minutes]
+        self.counts = {}    # Sparse Fenwick trees, 1-based index -> partial sum
+        self.minutes = {}
+
+    def day(self, day):
+        return tuple(self.per_day.get(day, (0, 0)))
+
+    def check(self, day):
+        # Fenwick index of `day`; ValueError outside the span
+        i = day + DAY_SPAN // 2 + 1
+        if not 1 <= i <= DAY_SPAN:
+            raise ValueError(f"day {day} out of range")
+        return i
+
+    def add(self, day, count, minutes):
+        i = self.check(day)
+        entry = self.per_day.setdefault(day, [0, 0])
+        entry[0] += count
+        entry[1] += minutes
+        if not entry[0]:
+            del self.per_day[day]
+        while i <= DAY_SPAN:
+            c = self.counts[i] = self.counts.get(i, 0) + count
+            m = self.minutes[i] = self.minutes.get(i, 0) + minutes
+            if not c and not m:
+                del self.counts[i], self.minutes[i]
+            i += i & -i
+
+    def prefix(self, day):
+        # Totals over days < day
+        i = min(max(day + DAY_SPAN // 2, 0), DAY_SPAN)
+        count = minutes = 0
+        while i > 0:
+            count += self.counts.get(i, 0)
+            minutes += self.minutes.get(i, 0)
+            i -= i & -i
+        return count, minutes
+
+    def range(self, lo, hi):
+        # Totals over lo <= day < hi
+        c1, m1 = self.prefix(lo)
+        c2, m2 = self.prefix(hi)
+        return c2 - c1, m2 - m1
+
+
+# --- Free Slots ---
+# Per-doctor free gaps inside working hours, stored only for days that have
+# events there; every other day is one open gap. The hooks rebuild just the
+# days an event touches (at most MAX_EVENTS_DAILY_LIMIT events each), so a
+# lookup is a dict hit plus a scan of a handful of gaps per day.
+
+class FreeSlots:
+    def __init__(self):
+        self.gaps = {}  # day -> sorted [(start, end)] free intervals, absolute minutes
+
+    def update(self, day, busy):
+        # busy: events overlapping the day's working hours, ordered by start
+        if not busy:
+            self.gaps.pop(day, None)
             return
-    print("SUGGESTION -1")
+        t = day * 1440 + WORK_START
+        gaps = []
+        for e in busy:
+            if e.start_time > t:
+                gaps.append((t, e.start_time))
+            t = max(t, e.end_time)
+        if t < day * 1440 + WORK_END:
+            gaps.append((t, day * 1440 + WORK_END))
+        self.gaps[day] = gaps
 
-def undo(doctor_id):
-    if not undo_stacks[doctor_id]:
-        print("OK") # Empty stack, do nothing
-        return
-        
-    eid = undo_stacks[doctor_id].pop()
-    
-    # Remove from Hash
-    key = eid % HASH_SIZE
-    # Find and remove
-    bucket = event_hash_map[doctor_id].get(key, [])
-    tgt = None
-    for e in bucket:
-        if e.id == eid:
-            tgt = e
-            break
-    if tgt:
-        bucket.remove(tgt)
-        
-    # Remove from Heap
-    upcoming_heaps[doctor_id] = [e for e in upcoming_heaps[doctor_id] if e.id != eid]
-    
-    # Rebuild Interval Tree
-    interval_trees[doctor_id] = None
-    for e in upcoming_heaps[doctor_id]:
-        interval_trees[doctor_id] = it_insert(interval_trees[doctor_id], e)
-        
-    print("OK")
+    def drop_before(self, day):
+        for d in [d for d in self.gaps if d < day]:
+            del self.gaps[d]
 
-def delete_event(doctor_id, event_id):
-    # Remove from Heap
-    upcoming_heaps[doctor_id] = [e for e in upcoming_heaps[doctor_id] if e.id != event_id]
-    
-    # Remove from Hash
-    key = event_id % HASH_SIZE
-    if key in event_hash_map[doctor_id]:
-        event_hash_map[doctor_id][key] = [e for e in event_hash_map[doctor_id][key] if e.id != event_id]
-        
-    # Rebuild Interval Tree
-    interval_trees[doctor_id] = None
-    for e in upcoming_heaps[doctor_id]:
-        interval_trees[doctor_id] = it_insert(interval_trees[doctor_id], e)
-        
-    print("OK")
-
-def set_limit(doctor_id, limit):
-    daily_limits[doctor_id] = limit
-    print("OK")
-
-
-def get_all(doctor_id):
-    events = []
-    # Heap is already sorted by start time
-    for e in upcoming_heaps[doctor_id]:
-        events.append({
-            "id": e.id,
-            "start": e.start_time,
-            "duration": e.duration,
-            "type": e.type,
-            "break": e.break_type,
-            "desc": e.description
+    def first_fit(self, day, t, duration):
+        # Earliest start >= t on `day` with `duration` free minutes before WORK_END, or None
+        gaps = self.gaps.get(day)
+        if gaps is None:
+            gaps = [(day * 1440 + WORK_START, day * 1440 + WORK_END)]
+        for lo, hi in gaps:
+            start = max(lo, t)
+            if hi - start >= duration:
+                return start
+        return None
+
+
+# --- Search Index ---
+# Sorted token table over every hot event's description, shared by all doctors.
+# Descriptions are [A-Za-z0-9_]; tokens are the lowercased "_"-separated words.
+# Entries are (token, doctor_id, start_time, event_id), so each token holds one
+# start-ordered run per doctor: a prefix query bisects to each matching run,
+# bisects again for the time window and merges the runs by start time. Cost is
+# the matches plus a log factor per run, never the size of the schedules.
+
+def desc_tokens(description):
+    return {t for t in description.lower().split("_") if t}
+
+class SearchIndex:
+    def __init__(self):
+        self.keys = []
+
+    def add(self, doctor_id, event):
+        for token in desc_tokens(event.description):
+            bisect.insort(self.keys, (token, doctor_id, event.start_time, event.id))
+
+    def remove(self, doctor_id, event):
+        for token in desc_tokens(event.description):
+            key = (token, doctor_id, event.start_time, event.id)
+            i = bisect.bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+
+    def search(self, prefix, doctor_id=None, lo=-sys.maxsize, hi=sys.maxsize):
+        # [(doctor_id, event_id)] for tokens starting with `prefix` and lo <= start < hi,
+        # ordered by (start, doctor_id, event_id); doctor_id None searches everyone
+        keys = self.keys
+        runs = []
+        i = bisect.bisect_left(keys, (prefix,))
+        while i < len(keys) and keys[i][0].startswith(prefix):
+            token = keys[i][0]
+            token_end = bisect.bisect_left(keys, (token, MAX_DOCTORS), i)
+            docs = [doctor_id] if doctor_id is not None else []
+            j = i
+            while doctor_id is None and j < token_end:
+                docs.append(keys[j][1])
+                j = bisect.bisect_left(keys, (token, keys[j][1] + 1), j, token_end)
+            for doc in docs:
+                a = bisect.bisect_left(keys, (token, doc, lo), i, token_end)
+                b = bisect.bisect_left(keys, (token, doc, hi), a, token_end)
+                if a < b:
+                    runs.append(keys[a:b])
+            i = token_end
+        hits = []
+        seen = set()
+        # An event can match through several tokens ("ann_annabel")
+        for _, doc, _, eid in heapq.merge(*runs, key=lambda k: (k[2], k[1], k[3])):
+            if (doc, eid) not in seen:
+                seen.add((doc, eid))
+                hits.append((doc, eid))
+        return hits
+
+
+# --- Snapshots ---
+# A frozen copy of one doctor's engine (Engine.copy), published for readers.
+# The write hooks drop it and the next read builds a fresh one, so GET, GET_PAGE,
+# SUGGEST and ALERT run without the scheduler lock, never see a half-applied
+# write, and a burst of reads after a write shares one copy and one GET rendering.
+# Reads still go through the engine interface, so difftest compares every
+# engine's read path. Events are copied because relocate re-keys live Event
+# objects in place.
+
+class Snapshot:
+    def __init__(self, engine):
+        self.engine = engine.copy()
+        self.rendered = None
+
+    def get_all(self):
+        # Engines iterate in start time order
+        return list(self.engine)
+
+    def to_json(self):
+        # GET response, rendered once per snapshot (racing threads render the same text)
+        if self.rendered is None:
+            self.rendered = json.dumps([event_json(e) for e in self.engine])
+        return self.rendered
+
+    def get_page(self, start, cursor=None, limit=20):
+        # Same contract as Scheduler.get_page
+        if limit < 1:
+            raise ValueError("page limit must be at least 1")
+        key = cursor if cursor else (start, 0)
+        events = self.engine.page(key[0], key[1], limit + 1)
+        if len(events) > limit:
+            events = events[:limit]
+            return events, (events[-1].start_time, events[-1].id)
+        return events, None
+
+    def suggest(self, duration, day_start):
+        for t in range(WORK_START, WORK_END + 1, 15):
+            global_t = day_start + t
+            if not self.engine.overlap(global_t, global_t + duration):
+                return global_t
+        return -1
+
+    def check_alert(self, curr_time):
+        e = self.engine.next_after(curr_time)
+        if e is None or e.start_time - curr_time >= 100000:
+            return -1
+        return e.start_time - curr_time
+
+
+# --- Cold Store ---
+# Whole days before a cutoff are moved out of the engines into one append-only
+# file per doctor of fixed-size records sorted by start time, so the hot
+# structures (and MAX_EVENTS_TOTAL) only cover the upcoming horizon.
+# Adding into an archived day is refused (ARCHIVED), which keeps appends sorted.
+# An event running past the cutoff stays hot until a later compaction, so
+# collision checks and free slots still see it.
+
+COLD_DESC_BYTES = 380 # The frontend's 95-character cap at up to 4 UTF-8 bytes each
+COLD_RECORD = struct.Struct(f"<iiiBB{COLD_DESC_BYTES}s") # start, duration, id, type, break, desc
+COLD_INT_MIN, COLD_INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+class ColdStore:
+    def __init__(self, path=None):
+        # Default is an anonymous temp file: cold data lives as long as the process
+        self.file = open(path, "w+b") if path else tempfile.TemporaryFile()
+        self.count = 0
+
+    def append(self, events):
+        # `events` must be sorted and start after everything already stored.
+        # Raises ValueError, having written nothing, if a record doesn't fit.
+        for e in events:
+            if not (all(COLD_INT_MIN <= v <= COLD_INT_MAX for v in (e.start_time, e.duration, e.id))
+                    and 0 <= e.type <= 255 and 0 <= e.break_type <= 255
+                    and len(e.description.encode("utf-8")) <= COLD_DESC_BYTES):
+                raise ValueError(f"event {e.id} doesn't fit a cold record")
+        data = b"".join(
+            COLD_RECORD.pack(e.start_time, e.duration, e.id, e.type, e.break_type, e.description.encode("utf-8"))
+            for e in events)
+        self.file.seek(0, 2)
+        self.file.write(data)
+        self.count += len(events)
+
+    def start_at(self, i):
+        self.file.seek(i * COLD_RECORD.size)
+        return struct.unpack("<i", self.file.read(4))[0]
+
+    def lower_bound(self, t):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.start_at(mid) < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, doctor_id, lo, hi):
+        i = self.lower_bound(lo)
+        j = self.lower_bound(hi)
+        self.file.seek(i * COLD_RECORD.size)
+        data = self.file.read((j - i) * COLD_RECORD.size)
+        events = []
+        for start, duration, eid, type_id, break_type, desc in COLD_RECORD.iter_unpack(data):
+            events.append(Event(eid, doctor_id, start, duration, type_id, break_type, desc.rstrip(b"\0").decode("utf-8", errors="replace")))
+        return events
+
+
+
+def wall_minutes():
+    # Same global minutes as the frontend: ordinal * 1440 + minutes_of_day
+    now = time.localtime()
+    return date.today().toordinal() * 1440 + now.tm_hour * 60 + now.tm_min
+
+def event_json(e):
+    return {
+        "id": e.id,
+        "start": e.start_time,
+        "duration": e.duration,
+        "type": e.type,
+        "break": e.break_type,
+        "desc": e.description
+    }
+
+
+# --- Scheduler ---
+# All backend state and logic. Methods return plain Python results; the command
+# loop in main() is only a text adapter, and the frontend can also import this
+# class and call it in-process. Callers must hold `lock` (the alert clock
+# thread shares it), except for the snapshot reads: get_all, get_page,
+# suggest and check_alert.
+#
+# Alerts: WATCH subscriptions share one min-heap of (fire_time, seq, doctor_id, event)
+# with fire_time = start_time - lead. Each event is pushed once when it is
+# scheduled; stale entries (deleted event, changed lead) are dropped when they
+# come due, so every alert costs O(log n) no matter how many doctors watch.
+# Pushes go to on_push(kind, doctor_id, event):
+#   ALERT_PUSH     event entered the lead window
+#   ALERT_CANCEL   a pushed event was removed
+
+class Scheduler:
+    def __init__(self, engine_name=DEFAULT_ENGINE, journal_depth=JOURNAL_DEPTH, cold_dir=None, on_push=None):
+        self.global_event_id = 1
+        self.engines = {i: ENGINES[engine_name]() for i in range(MAX_DOCTORS)}
+        self.journals = {i: Journal(journal_depth) for i in range(MAX_DOCTORS)}
+        self.daily_limits = {i: 480 for i in range(MAX_DOCTORS)} # Default 8 hours
+        # Kept through compaction, so utilization still covers archived days
+        self.day_totals = {i: DayTotals() for i in range(MAX_DOCTORS)}
+        self.free_slots = {i: FreeSlots() for i in range(MAX_DOCTORS)}
+        self.snapshots = {}     # doctor_id -> published Snapshot, dropped on every write
+        self.search_index = SearchIndex() # Hot events only; compaction drops archived ones
+
+        self.on_push = on_push
+        self.watch_leads = {}   # doctor_id -> lead minutes
+        self.alerted = {}       # doctor_id -> ids already pushed
+        self.alert_heap = []
+        self.alert_seq = itertools.count()
+        self.alert_clock = 0    # Latest minute the heap was advanced to
+        self.lock = threading.RLock()
+        self.alert_wakeup = threading.Condition(self.lock)
+        self.clock_running = False
+
+        self.cold_stores = {}   # doctor_id -> ColdStore, created on first compaction
+        self.cold_horizon = {}  # doctor_id -> day start before which events are cold
+        self.cold_dir = cold_dir # Keep cold files as cold_<doctor>.bin
+        self.compacted_until = 0
+
+    # --- Helpers ---
+
+    # All inserts/removals go through these two so side indexes stay in step with the engine
+    def insert_event(self, doctor_id, event):
+        # Day totals first: they refuse out-of-range days before anything changes
+        self.day_totals[doctor_id].add(event.start_time // 1440, 1, event.duration)
+        self.engines[doctor_id].insert(event)
+        self.snapshots.pop(doctor_id, None)
+        self.search_index.add(doctor_id, event)
+        self.refresh_free(doctor_id, event)
+        self.schedule_alert(doctor_id, event)
+
+    def remove_event(self, doctor_id, event_id):
+        event = self.engines[doctor_id].remove(event_id)
+        if event:
+            self.snapshots.pop(doctor_id, None)
+            self.search_index.remove(doctor_id, event)
+            self.day_totals[doctor_id].add(event.start_time // 1440, -1, -event.duration)
+            self.refresh_free(doctor_id, event)
+            self.cancel_alert(doctor_id, event)
+        return event
+
+    def refresh_free(self, doctor_id, event):
+        # Rebuild the free gaps of every day the event's time span touches
+        engine = self.engines[doctor_id]
+        for day in range(event.start_time // 1440, (event.end_time - 1) // 1440 + 1):
+            busy = engine.overlaps(day * 1440 + WORK_START, day * 1440 + WORK_END)
+            self.free_slots[doctor_id].update(day, busy)
+
+    def snapshot(self, doctor_id):
+        # Lock-free while a snapshot is published; the first read after a write builds it
+        snap = self.snapshots.get(doctor_id)
+        if snap is None:
+            with self.lock:
+                snap = self.snapshots.get(doctor_id)
+                if snap is None:
+                    snap = self.snapshots[doctor_id] = Snapshot(self.engines[doctor_id])
+        return snap
+
+    def apply_op(self, doctor_id, op, inverse):
+        kind = op[0]
+        if kind == "ADD" or kind == "DELETE":
+            event = op[1]
+            if (kind == "ADD") == inverse:
+                self.remove_event(doctor_id, event.id)
+            else:
+                self.insert_event(doctor_id, event)
+        elif kind == "SET_LIMIT":
+            self.daily_limits[doctor_id] = op[1] if inverse else op[2]
+        elif kind == "MOVE":
+            start, duration = op[2] if inverse else op[3]
+            self.relocate(doctor_id, op[1], start, duration)
+
+    def relocate(self, doctor_id, event, start, duration):
+        # Re-keys the same Event object; the hooks keep every index in step.
+        # The new day is checked first so a refused move leaves the event where it was.
+        self.day_totals[doctor_id].check(start // 1440)
+        self.remove_event(doctor_id, event.id)
+        event.start_time = start
+        event.duration = duration
+        event.end_time = start + duration
+        self.insert_event(doctor_id, event)
+
+    # --- Logic ---
+
+    def add_event(self, doctor_id, start, duration, type_id, break_type, desc):
+        # Returns (status, result): the new event for OK, every clashing event (by start) for COLLISION
+        engine = self.engines[doctor_id]
+
+        # Archived day (see compact)
+        if start < self.cold_horizon.get(doctor_id, 0):
+            return "ARCHIVED", None
+
+        # Global Limit
+        if len(engine) >= MAX_EVENTS_TOTAL:
+            return "MAX_EVENTS", None
+
+        # Daily Limit
+        count, curr_duration = self.day_totals[doctor_id].day(start // 1440)
+        if count >= MAX_EVENTS_DAILY_LIMIT:
+            return "MAX_EVENTS", None
+
+        # Time Limit
+        if curr_duration + duration > self.daily_limits[doctor_id]:
+            return "TIME_LIMIT", None
+
+        end = start + duration
+
+        # Collision
+        clashes = engine.overlaps(start, end)
+        if clashes:
+            return "COLLISION", clashes
+
+        # Insert
+        eid = self.global_event_id
+        self.global_event_id += 1
+
+        new_event = Event(eid, doctor_id, start, duration, type_id, break_type, desc)
+        self.insert_event(doctor_id, new_event)
+        self.journals[doctor_id].record(("ADD", new_event))
+        return "OK", new_event
+
+    def move_event(self, doctor_id, event_id, start, duration=None):
+        # Same checks as add_event, ignoring the event itself, then an in-place
+        # re-key under the caller's lock: no window where the old slot is free.
+        # Returns (status, result) like add_event; NOT_FOUND for unknown ids.
+        event = self.engines[doctor_id].get(event_id)
+        if event is None:
+            return "NOT_FOUND", None
+        if duration is None:
+            duration = event.duration
+
+        if start < self.cold_horizon.get(doctor_id, 0):
+            return "ARCHIVED", None
+
+        day = start // 1440
+        count, minutes = self.day_totals[doctor_id].day(day)
+        if event.start_time // 1440 == day:
+            count -= 1
+            minutes -= event.duration
+        if count >= MAX_EVENTS_DAILY_LIMIT:
+            return "MAX_EVENTS", None
+        if minutes + duration > self.daily_limits[doctor_id]:
+            return "TIME_LIMIT", None
+
+        clashes = [e for e in self.engines[doctor_id].overlaps(start, start + duration) if e is not event]
+        if clashes:
+            return "COLLISION", clashes
+
+        old = (event.start_time, event.duration)
+        self.relocate(doctor_id, event, start, duration)
+        self.journals[doctor_id].record(("MOVE", event, old, (start, duration)))
+        return "OK", event
+
+    def suggest(self, doctor_id, duration, day_start):
+        # 8:00 AM (480) to 8:00 PM (1200); -1 if nothing fits
+        return self.snapshot(doctor_id).suggest(duration, day_start)
+
+    def next_open(self, doctor_id, from_time, duration):
+        # Earliest start >= from_time where `duration` minutes fit inside working
+        # hours and an ADD would pass the daily limits; -1 if there is none.
+        # Only days holding events can be passed over, so the walk stops at the
+        # first empty day after the current run of booked ones.
+        limit = self.daily_limits[doctor_id]
+        if duration <= 0 or duration > min(WORK_END - WORK_START, limit):
+            return -1
+        if len(self.engines[doctor_id]) >= MAX_EVENTS_TOTAL:
+            return -1
+        t = max(from_time, self.cold_horizon.get(doctor_id, 0))
+        day = t // 1440
+        totals = self.day_totals[doctor_id]
+        slots = self.free_slots[doctor_id]
+        while True:
+            count, minutes = totals.day(day)
+            if count < MAX_EVENTS_DAILY_LIMIT and minutes + duration <= limit:
+                start = slots.first_fit(day, t, duration)
+                if start is not None:
+                    return start
+            day += 1
+            t = day * 1440
+
+    def undo(self, doctor_id, steps=1):
+        # Returns the number of steps undone (fewer when the journal runs out)
+        journal = self.journals[doctor_id]
+        done = 0
+        while done < steps and journal.undo_ops:
+            op = journal.undo_ops.pop()
+            self.apply_op(doctor_id, op, inverse=True)
+            journal.redo_ops.append(op)
+            done += 1
+        return done
+
+    def redo(self, doctor_id, steps=1):
+        journal = self.journals[doctor_id]
+        done = 0
+        while done < steps and journal.redo_ops:
+            op = journal.redo_ops.pop()
+            self.apply_op(doctor_id, op, inverse=False)
+            journal.undo_ops.append(op)
+            done += 1
+        return done
+
+    def delete_event(self, doctor_id, event_id):
+        # Returns the deleted Event or None
+        event = self.remove_event(doctor_id, event_id)
+        if event:
+            self.journals[doctor_id].record(("DELETE", event))
+        return event
+
+    def set_limit(self, doctor_id, limit):
+        self.journals[doctor_id].record(("SET_LIMIT", self.daily_limits[doctor_id], limit))
+        self.daily_limits[doctor_id] = limit
+
+    def get_all(self, doctor_id):
+        # Start time order
+        return self.snapshot(doctor_id).get_all()
+
+    def get_page(self, doctor_id, start, cursor=None, limit=20):
+        # Returns (events, next_cursor). The cursor is the (start, id) key of the last
+        # event returned, so it stays valid across adds/deletes; None starts at `start`.
+        # Raises ValueError for limit < 1.
+        return self.snapshot(doctor_id).get_page(start, cursor, limit)
+
+    def search(self, doctor_id, prefix, lo=-sys.maxsize, hi=sys.maxsize):
+        # [(doctor_id, Event)] whose description has a word starting with `prefix`
+        # (case-insensitive), lo <= start < hi, in time order; doctor_id None = all doctors.
+        # Tokens never hold "_", so "ann_sm" means words starting "ann" and "sm":
+        # the index answers the first, the rest filter its matches.
+        words = [w for w in prefix.lower().split("_") if w]
+        if not words:
+            raise ValueError("empty search prefix")
+        hits = [(doc, self.engines[doc].get(eid)) for doc, eid in self.search_index.search(words[0], doctor_id, lo, hi)]
+        if len(words) > 1:
+            hits = [(doc, e) for doc, e in hits
+                    if all(any(t.startswith(w) for t in desc_tokens(e.description)) for w in words[1:])]
+        return hits
+
+    def utilization(self, doctor_id, from_day, to_day):
+        # Days are ordinals (start // 1440), both ends inclusive.
+        # Returns ([(day, count, minutes, remaining_minutes)], total_count, total_minutes).
+        # Raises ValueError for a reversed range or one over UTIL_MAX_DAYS days.
+        if from_day > to_day:
+            raise ValueError("from_day after to_day")
+        if to_day - from_day >= UTIL_MAX_DAYS:
+            raise ValueError(f"more than {UTIL_MAX_DAYS} days")
+        totals = self.day_totals[doctor_id]
+        limit = self.daily_limits[doctor_id]
+        days = []
+        for day in range(from_day, to_day + 1):
+            count, minutes = totals.day(day)
+            days.append((day, count, minutes, limit - minutes))
+        total_count, total_minutes = totals.range(from_day, to_day + 1)
+        return days, total_count, total_minutes
+
+    def overlaps(self, doctor_id, start, end):
+        return self.engines[doctor_id].overlaps(start, end)
+
+    def check_alert(self, doctor_id, curr_time):
+        # Minutes until the next event, or -1. Same cut-off as the C backend
+        # (min_diff starts at 100000)
+        return self.snapshot(doctor_id).check_alert(curr_time)
+
+    # --- Alerts ---
+
+    def push(self, kind, doctor_id, event):
+        if self.on_push:
+            self.on_push(kind, doctor_id, event)
+
+    def schedule_alert(self, doctor_id, event):
+        lead = self.watch_leads.get(doctor_id)
+        if lead is None:
+            return
+        heapq.heappush(self.alert_heap, (event.start_time - lead, next(self.alert_seq), doctor_id, event))
+        if self.clock_running:
+            self.alert_wakeup.notify()
+
+    def cancel_alert(self, doctor_id, event):
+        pushed = self.alerted.get(doctor_id)
+        if pushed and event.id in pushed:
+            pushed.discard(event.id)
+            self.push("ALERT_CANCEL", doctor_id, event)
+
+    def advance_alerts(self, now):
+        self.alert_clock = max(self.alert_clock, now)
+        heap = self.alert_heap
+        while heap and heap[0][0] <= now:
+            fire_time, _, doctor_id, event = heapq.heappop(heap)
+            lead = self.watch_leads.get(doctor_id)
+            if lead is None or fire_time != event.start_time - lead:
+                continue
+            if self.engines[doctor_id].get(event.id) is not event or event.start_time < now:
+                continue
+            if event.id in self.alerted[doctor_id]:
+                continue
+            self.alerted[doctor_id].add(event.id)
+            self.push("ALERT_PUSH", doctor_id, event)
+
+    def watch(self, doctor_id, lead, now=None):
+        self.watch_leads[doctor_id] = lead
+        self.alerted.setdefault(doctor_id, set())
+        for e in self.engines[doctor_id].range(self.alert_clock, sys.maxsize):
+            self.schedule_alert(doctor_id, e)
+        if now is not None:
+            self.advance_alerts(now)
+
+    def unwatch(self, doctor_id):
+        self.watch_leads.pop(doctor_id, None)
+        self.alerted.pop(doctor_id, None)
+
+    def alert_clock_loop(self):
+        # Sleeps until the next entry is due (re-checking at least once a minute).
+        # Also moves finished days to the cold store when the date rolls over.
+        with self.alert_wakeup:
+            while True:
+                now = wall_minutes()
+                self.advance_alerts(now)
+                if now // 1440 * 1440 > self.compacted_until:
+                    try:
+                        self.compact(now)
+                    except Exception:
+                        pass # Those events stay hot; retried at the next rollover
+                timeout = 60
+                if self.alert_heap:
+                    timeout = min(timeout, max(1, (self.alert_heap[0][0] - now) * 60 - time.localtime().tm_sec))
+                self.alert_wakeup.wait(timeout)
+
+    def start_clock(self):
+        self.clock_running = True
+        threading.Thread(target=self.alert_clock_loop, daemon=True).start()
+
+    # --- Cold Store ---
+
+    def compact(self, cutoff):
+        # Moves every event that ends by the day of `cutoff` to the cold store.
+        # Journals are cleared: history from before a compaction can't be undone.
+        # Returns the number of events moved. A doctor whose events don't fit the
+        # cold records keeps them hot (and its horizon); the error is raised after
+        # every other doctor is done.
+        cutoff = cutoff // 1440 * 1440
+        self.compacted_until = max(self.compacted_until, cutoff)
+        moved = 0
+        error = None
+        for doctor_id, engine in self.engines.items():
+            if cutoff <= self.cold_horizon.get(doctor_id, 0):
+                continue
+            old = [e for e in engine.range(-sys.maxsize, cutoff) if e.end_time <= cutoff]
+            if old:
+                if doctor_id not in self.cold_stores:
+                    path = os.path.join(self.cold_dir, f"cold_{doctor_id}.bin") if self.cold_dir else None
+                    self.cold_stores[doctor_id] = ColdStore(path)
+                # Written before anything leaves the hot tier
+                try:
+                    self.cold_stores[doctor_id].append(old)
+                except ValueError as e:
+                    error = error or e
+                    continue
+                self.snapshots.pop(doctor_id, None)
+                for e in old:
+                    engine.remove(e.id)
+                    self.search_index.remove(doctor_id, e)
+                    self.alerted.get(doctor_id, set()).discard(e.id)
+                moved += len(old)
+            # Even with nothing moved: an undo must not bring back an event below the horizon
+            self.journals[doctor_id].clear()
+            self.cold_horizon[doctor_id] = cutoff
+            self.free_slots[doctor_id].drop_before(cutoff // 1440)
+        if error:
+            raise error
+        return moved
+
+    def get_cold(self, doctor_id, lo, hi):
+        store = self.cold_stores.get(doctor_id)
+        return store.range(doctor_id, lo, hi) if store else []
+
+
+# --- Command Adapter ---
+# Text protocol shared with scheduler.c. One response line per command; pushed
+# alert lines may appear between responses.
+
+# Protocol verb for each Scheduler method the frontend calls in-process
+CALL_VERBS = {
+    "add_event": "ADD", "move_event": "MOVE", "suggest": "SUGGEST", "undo": "UNDO", "redo": "REDO",
+    "next_open": "NEXT_OPEN", "get_all": "GET", "get_page": "GET_PAGE", "get_cold": "COLD",
+    "utilization": "UTIL", "search": "SEARCH", "watch": "WATCH", "delete_event": "DELETE",
+    "set_limit": "SET_LIMIT",
+}
+
+def command_line(method, args):
+    # Command text for an in-process call, so its trace replays over any pipe backend.
+    # Trailing None args are optional ones; others (a GET_PAGE cursor) are "-".
+    args = list(args)
+    while args and args[-1] is None:
+        args.pop()
+    # One undo step is plain "UNDO doc": scheduler.c reads no step count
+    if method == "undo" and args[1:] == [1]:
+        args.pop()
+    text = [f"{a[0]}:{a[1]}" if isinstance(a, tuple) else "-" if a is None else str(a) for a in args]
+    return " ".join([CALL_VERBS[method]] + text)
+
+# Answered from the doctor's snapshot (parts[1]), so they can run off the lock
+READ_COMMANDS = {"GET", "GET_PAGE", "SUGGEST", "ALERT"}
+
+def execute_read(snap, parts):
+    cmd = parts[0]
+
+    if cmd == "GET":
+        return snap.to_json()
+
+    elif cmd == "GET_PAGE":
+        # GET_PAGE doc_id from cursor limit; cursor is "start:id" or "-" for the first page
+        cursor = None
+        if parts[3] != "-":
+            s, eid = parts[3].split(":")
+            cursor = (int(s), int(eid))
+        limit = int(parts[4])
+        if limit < 1:
+            return "ERROR"
+        events, nxt = snap.get_page(int(parts[2]), cursor, limit)
+        return json.dumps({"events": [event_json(e) for e in events], "next": f"{nxt[0]}:{nxt[1]}" if nxt else None})
+
+    elif cmd == "SUGGEST":
+        # SUGGEST doc_id duration day_start
+        return f"SUGGESTION {snap.suggest(int(parts[2]), int(parts[3]))}"
+
+    elif cmd == "ALERT":
+        # ALERT doc_id curr_time
+        return str(snap.check_alert(int(parts[2])))
+
+
+def execute(sched, parts):
+    # Returns the response line, or None for EXIT
+    cmd = parts[0]
+
+    if cmd in READ_COMMANDS:
+        return execute_read(sched.snapshot(int(parts[1])), parts)
+
+    elif cmd == "ADD":
+        # ADD doc_id start duration type break desc
+        doc_id = int(parts[1])
+        start = int(parts[2])
+        dur = int(parts[3])
+        tid = int(parts[4])
+        bid = int(parts[5])
+        desc = parts[6]
+        status, result = sched.add_event(doc_id, start, dur, tid, bid, desc)
+        if status == "COLLISION":
+            # COLLISION s1 e1 [s2 e2 ...]: every clash, earliest first (scheduler.c sends one pair)
+            return "COLLISION " + " ".join(f"{e.start_time} {e.end_time}" for e in result)
+        return status
+
+    elif cmd == "MOVE":
+        # MOVE doc_id event_id new_start [new_duration]
+        doc_id = int(parts[1])
+        eid = int(parts[2])
+        start = int(parts[3])
+        dur = int(parts[4]) if len(parts) > 4 else None
+        status, result = sched.move_event(doc_id, eid, start, dur)
+        if status == "COLLISION":
+            return "COLLISION " + " ".join(f"{e.start_time} {e.end_time}" for e in result)
+        return status
+
+    elif cmd == "NEXT_OPEN":
+        # NEXT_OPEN doc_id from_time duration; -1 when nothing is bookable
+        doc_id = int(parts[1])
+        return f"OPENING {sched.next_open(doc_id, int(parts[2]), int(parts[3]))}"
+
+    elif cmd == "UNDO":
+        # UNDO doc_id [n]; OK even when there was nothing to undo
+        doc_id = int(parts[1])
+        steps = int(parts[2]) if len(parts) > 2 else 1
+        sched.undo(doc_id, steps)
+        return "OK"
+
+    elif cmd == "REDO":
+        # REDO doc_id [n]
+        doc_id = int(parts[1])
+        steps = int(parts[2]) if len(parts) > 2 else 1
+        sched.redo(doc_id, steps)
+        return "OK"
+
+    elif cmd == "SEARCH":
+        # SEARCH doc_id|* prefix [from to]: JSON events with a "doctor" field, in time order.
+        # "a_b" in the prefix asks for words starting "a" and "b"
+        doc_id = None if parts[1] == "*" else int(parts[1])
+        lo, hi = (int(parts[3]), int(parts[4])) if len(parts) > 4 else (-sys.maxsize, sys.maxsize)
+        hits = sched.search(doc_id, parts[2], lo, hi)
+        return json.dumps([dict(event_json(e), doctor=doc) for doc, e in hits])
+
+    elif cmd == "UTIL":
+        # UTIL doc_id from_day to_day (day ordinals, inclusive)
+        doc_id = int(parts[1])
+        days, count, minutes = sched.utilization(doc_id, int(parts[2]), int(parts[3]))
+        return json.dumps({
+            "days": [{"day": d, "count": c, "minutes": m, "remaining": r} for d, c, m, r in days],
+            "count": count,
+            "minutes": minutes
         })
-    print(json.dumps(events))
 
-def check_alert(doctor_id, curr_time):
-    if not upcoming_heaps[doctor_id]:
-        print("-1")
-        return
-        
-    min_diff = 100000
-    found = False
-    
-    for e in upcoming_heaps[doctor_id]:
-        diff = e.start_time - curr_time
-        if diff >= 0 and diff < min_diff:
-            min_diff = diff
-            found = True
-            
-    if found:
-        print(f"{min_diff}")
-    else:
-        print("-1")
+    elif cmd == "OVERLAPS":
+        # OVERLAPS doc_id start end: events overlapping [start, end) as JSON, like GET
+        doc_id = int(parts[1])
+        return json.dumps([event_json(e) for e in sched.overlaps(doc_id, int(parts[2]), int(parts[3]))])
+
+    elif cmd == "DELETE":
+        doc_id = int(parts[1])
+        eid = int(parts[2])
+        sched.delete_event(doc_id, eid)
+        return "OK"
+
+    elif cmd == "SET_LIMIT":
+        doc_id = int(parts[1])
+        limit = int(parts[2])
+        sched.set_limit(doc_id, limit)
+        return "OK"
+
+    elif cmd == "WATCH":
+        # WATCH doc_id lead_minutes [now]
+        doc_id = int(parts[1])
+        lead = int(parts[2])
+        now = int(parts[3]) if len(parts) > 3 else None
+        sched.watch(doc_id, lead, now)
+        return "OK"
+
+    elif cmd == "UNWATCH":
+        sched.unwatch(int(parts[1]))
+        return "OK"
+
+    elif cmd == "COMPACT":
+        # COMPACT cutoff: archive whole days before cutoff
+        sched.compact(int(parts[1]))
+        return "OK"
+
+    elif cmd == "COLD":
+        # COLD doc_id from to: archived events as JSON, like GET
+        doc_id = int(parts[1])
+        return json.dumps([event_json(e) for e in sched.get_cold(doc_id, int(parts[2]), int(parts[3]))])
+
+    elif cmd == "TICK":
+        # TICK now: push alerts due by `now` (for --manual-clock)
+        sched.advance_alerts(int(parts[1]))
+        return "OK"
+
+    elif cmd == "EXIT":
+        return None
+
+    # Every line gets an answer so the frontend never blocks on readline
+    return "ERROR"
+
+
+def push_line(kind, doctor_id, event):
+    if kind == "ALERT_PUSH":
+        return f"ALERT_PUSH {doctor_id} {event.id} {event.start_time}"
+    return f"{kind} {doctor_id} {event.id}"
+
+
+def print_answers(out):
+    # Printer thread: writes answers, pushed lines and pending reads in queue order; None ends
+    while True:
+        item = out.get()
+        if item is None:
+            return
+        if not isinstance(item, str):
+            try:
+                item = item.result()
+            except Exception:
+                item = "ERROR"
+        print(item)
+
 
 def main():
     # Unbuffered IO
     sys.stdin = open(sys.stdin.fileno(), 'r', encoding='utf-8')
     sys.stdout = open(sys.stdout.fileno(), 'w', encoding='utf-8', buffering=1)
 
+    # python scheduler.py [--engine tree|sorted] [--journal-depth N] [--manual-clock] [--cold-dir DIR]
+    #                     [--read-threads N]
+    engine_name = DEFAULT_ENGINE
+    if "--engine" in sys.argv[1:]:
+        engine_name = sys.argv[sys.argv.index("--engine") + 1]
+    journal_depth = JOURNAL_DEPTH
+    if "--journal-depth" in sys.argv[1:]:
+        journal_depth = int(sys.argv[sys.argv.index("--journal-depth") + 1])
+    cold_dir = None
+    if "--cold-dir" in sys.argv[1:]:
+        cold_dir = sys.argv[sys.argv.index("--cold-dir") + 1]
+    # --read-threads N: read commands go to a pool with the snapshot current when
+    # they arrive, so later writes don't wait for them; answers still come out in
+    # command order. Off by default: under the GIL the hand-off costs more than
+    # it overlaps, and snapshot reads are already cheap inline.
+    read_threads = 0
+    if "--read-threads" in sys.argv[1:]:
+        read_threads = int(sys.argv[sys.argv.index("--read-threads") + 1])
+
+    out = queue.Queue()
+    sched = Scheduler(engine_name, journal_depth, cold_dir,
+                      on_push=lambda kind, doctor_id, event: out.put(push_line(kind, doctor_id, event)))
+    # --manual-clock: alerts only advance on TICK (deterministic, used by difftest)
+    if "--manual-clock" not in sys.argv[1:]:
+        sched.start_clock()
+    pool = ThreadPoolExecutor(read_threads) if read_threads else None
+    printer = threading.Thread(target=print_answers, args=(out,), daemon=True)
+    printer.start()
+
     while True:
         try:
             line = sys.stdin.readline()
             if not line: break
             parts = line.strip().split()
             if not parts: continue
-            
-            cmd = parts[0]
-            
-            if cmd == "ADD":
-                # ADD doc_id start duration type break desc
-                doc_id = int(parts[1])
-                start = int(parts[2])
-                dur = int(parts[3])
-                tid = int(parts[4])
-                bid = int(parts[5])
-                desc = parts[6]
-                add_event(doc_id, start, dur, tid, bid, desc)
-                
-            elif cmd == "SUGGEST":
-                doc_id = int(parts[1])
-                dur = int(parts[2])
-                day_start = int(parts[3])
-                suggest(doc_id, dur, day_start)
-                
-            elif cmd == "UNDO":
-                doc_id = int(parts[1])
-                undo(doc_id)
-                
-            elif cmd == "GET":
-                doc_id = int(parts[1])
-                get_all(doc_id)
-                
-            elif cmd == "ALERT":
-                doc_id = int(parts[1])
-                curr = int(parts[2])
-                check_alert(doc_id, curr)
-
-            elif cmd == "DELETE":
-                doc_id = int(parts[1])
-                eid = int(parts[2])
-                delete_event(doc_id, eid)
-
-            elif cmd == "SET_LIMIT":
-                doc_id = int(parts[1])
-                limit = int(parts[2])
-                set_limit(doc_id, limit)
-
-                
-            elif cmd == "EXIT":
-                break
-                
+
+            with sched.lock:
+                if pool and parts[0] in READ_COMMANDS:
+                    out.put(pool.submit(execute_read, sched.snapshot(int(parts[1])), parts))
+                    continue
+                resp = execute(sched, parts)
+                if resp is None:
+                    break
+                out.put(resp)
+
         except Exception as e:
             # sys.stderr.write(str(e))
+            out.put("ERROR")
             continue
 
+    out.put(None)
+    printer.join()
+    if pool:
+        pool.shutdown()
+
 if __name__ == "__main__":
     main()
@@ -4,29 +4,75 @@ import time
 import json
 import sys
 import os
+import hmac
+import queue
+import sqlite3
+import hashlib
+import secrets
+import itertools
+import threading
 from datetime import date
 
 # --- Constants ---
 SESSION_DURATION = 900 # 15 minutes
-USERS_FILE = os.path.join(os.path.dirname(__file__), "users.json")
+ALERT_LEAD = 30 # Minutes before an event the backend pushes an alert
+PAGE_SIZE = 20 # Events per GET_PAGE round trip
+OPENING_DURATION = 30 # Slot length the dashboard's "Next Opening" looks for
+USERS_FILE = os.path.join(os.path.dirname(__file__), "users.json") # Legacy, imported into USERS_DB
+USERS_DB = os.path.join(os.path.dirname(__file__), "users.db")
+MAX_ACCOUNTS = 2
+PASSWORD_ITERATIONS = 200_000 # PBKDF2 cost; changing it re-hashes on next login
+TRACE_FILE = os.environ.get("SCHEDULER_TRACE") # If set, every backend command is recorded here for backend/replay.py
 
 # --- Backend Interface ---
 class SchedulerBackend:
-    def __init__(self):
+    # mode: "exe" (compiled scheduler.c over pipes), "subprocess" (scheduler.py over pipes)
+    # or "inprocess" (scheduler.Scheduler imported and called directly).
+    # Default: exe when built, otherwise in-process. SCHEDULER_MODE overrides.
+    # trace_path: append one JSON line per command {"ts", "cmd", "latency_us"}.
+    def __init__(self, mode=None, trace_path=TRACE_FILE):
+        self.lock = threading.Lock()
+        self.trace_lock = threading.Lock()
+        self.trace = open(trace_path, "a", encoding="utf-8", buffering=1) if trace_path else None
+        self.responses = queue.Queue()
+        # Pushed alerts: doc_id -> {event_id: start}; push_alerts is cleared if the backend has no WATCH
+        self.alerts = {}
+        self.push_alerts = True
+        self.limits = {} # Last SET_LIMIT per doctor, for the UTIL fallback
+        # Verbs scheduler.exe answered ERROR to; their fallbacks run without asking again
+        self.unsupported = set()
+        self.native = False # True when talking to scheduler.exe
+        self.process = None
+        self.scheduler = None
         backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend"))
         exe_path = os.path.join(backend_dir, "scheduler.exe")
         py_path = os.path.join(backend_dir, "scheduler.py")
 
+        mode = mode or os.environ.get("SCHEDULER_MODE")
+        if not mode:
+            mode = "exe" if os.path.exists(exe_path) else "inprocess"
+
+        if mode == "inprocess" and os.path.exists(py_path):
+            # No pipes, no text protocol: calls go straight to the Scheduler under its lock
+            if backend_dir not in sys.path:
+                sys.path.insert(0, backend_dir)
+            import scheduler
+            self.command_line = scheduler.command_line # Protocol text of a call, for traces
+            self.scheduler = scheduler.Scheduler(on_push=self.on_push)
+            self.scheduler.start_clock()
+            print("Using In-Process Python Backend")
+            return
+
         cmd = []
-        if os.path.exists(exe_path):
+        if mode == "exe" and os.path.exists(exe_path):
             cmd = [exe_path]
+            self.native = True
         elif os.path.exists(py_path):
             # Fallback to Python implementation
             cmd = [sys.executable, py_path]
             print("Using Python Fallback Backend")
         else:
             st.error(f"Backend not found! Looked for {exe_path} or {py_path}")
-            self.process = None
             return
 
         try:
@@ -41,6 +87,28 @@ class SchedulerBackend:
         except Exception as e:
             st.error(f"Failed to start backend: {e}")
             self.process = None
+            return
+
+        threading.Thread(target=self.read_loop, daemon=True).start()
+
+    def on_push(self, kind, doc_id, event):
+        # In-process alert pushes (called by the Scheduler's clock thread)
+        if kind == "ALERT_PUSH":
+            self.alerts.setdefault(doc_id, {})[event.id] = event.start_time
+        elif kind == "ALERT_CANCEL":
+            self.alerts.get(doc_id, {}).pop(event.id, None)
+
+    def read_loop(self):
+        # Pushed alert lines can arrive at any time; everything else answers a command
+        for line in self.process.stdout:
+            parts = line.split()
+            if parts and parts[0] == "ALERT_PUSH":
+                self.alerts.setdefault(int(parts[1]), {})[int(parts[2])] = int(parts[3])
+            elif parts and parts[0] == "ALERT_CANCEL":
+                self.alerts.get(int(parts[1]), {}).pop(int(parts[2]), None)
+            else:
+                self.responses.put(line.strip())
+        self.responses.put(None)
 
     def send_command(self, cmd):
         if not self.process: return None
@@ -50,49 +118,222 @@ class SchedulerBackend:
             return None
         
         try:
-            self.process.stdin.write(cmd + "\n")
-            self.process.stdin.flush()
-            return self.process.stdout.readline().strip()
+            started = time.time()
+            t0 = time.perf_counter()
+            with self.lock:
+                self.process.stdin.write(cmd + "\n")
+                self.process.stdin.flush()
+                resp = self.responses.get()
+            self.record(cmd, started, time.perf_counter() - t0)
+            return resp
         except Exception as e:
             st.error(f"Communication Error: {e}")
             return None
 
+    # Answered from published snapshots, so they don't wait for writers
+    SNAPSHOT_READS = {"get_all", "get_page", "suggest"}
+
+    def call(self, method, *args):
+        # In-process equivalent of send_command
+        started = time.time()
+        t0 = time.perf_counter()
+        if method in self.SNAPSHOT_READS:
+            result = getattr(self.scheduler, method)(*args)
+        else:
+            with self.scheduler.lock:
+                result = getattr(self.scheduler, method)(*args)
+        if self.trace:
+            # Same text send_command would have sent, so traces replay on any backend
+            self.record(self.command_line(method, args), started, time.perf_counter() - t0)
+        return result
+
+    def send_optional(self, cmd):
+        # For commands scheduler.exe lacks: None means "use the fallback". Once the
+        # exe has answered ERROR to a verb it isn't sent again, like WATCH and push_alerts.
+        verb = cmd.split()[0]
+        if verb in self.unsupported:
+            return None
+        resp = self.send_command(cmd)
+        if resp == "ERROR":
+            if self.native:
+                self.unsupported.add(verb)
+            return None
+        return resp
+
+    def record(self, cmd, started, elapsed):
+        if not self.trace:
+            return
+        line = json.dumps({"ts": round(started, 6), "cmd": cmd, "latency_us": round(elapsed * 1e6)})
+        with self.trace_lock:
+            self.trace.write(line + "\n")
+
     def add_event(self, doc_id, start, duration, type_id, break_type, desc):
         desc = "".join(c for c in desc if c.isalnum() or c in " -_")
         desc = desc.replace(" ", "_").replace("-", "_")
         if not desc: desc = "Event"
         if len(desc) > 95: desc = desc[:95]
         
-        resp = self.send_command(f"ADD {doc_id} {start} {duration} {type_id} {break_type} {desc}")
+        if self.scheduler:
+            resp, result = self.call("add_event", doc_id, start, duration, type_id, break_type, desc)
+            if resp == "COLLISION":
+                resp = "COLLISION " + " ".join(f"{e.start_time} {e.end_time}" for e in result)
+        else:
+            resp = self.send_command(f"ADD {doc_id} {start} {duration} {type_id} {break_type} {desc}")
         if resp == "OK":
             st.session_state['edu_msg'] = " Added: Inserted into Hash Map (O(1)), Interval Tree (O(log n)) & Min Heap. Stack updated for Undo."
         elif resp and resp.startswith("COLLISION"):
-            st.session_state['edu_msg'] = " Collision: Interval Tree detection found overlapping interval [Start, End)."
+            st.session_state['edu_msg'] = " Collision: Interval Tree overlap query listed every interval clashing with [Start, End)."
         return resp
 
     def suggest(self, doc_id, duration, day_start):
         st.session_state['edu_msg'] = " Suggestion Algo: Linear scan checked against Interval Tree verification for free slots."
+        if self.scheduler:
+            return self.call("suggest", doc_id, duration, day_start)
         resp = self.send_command(f"SUGGEST {doc_id} {duration} {day_start}")
         if resp and resp.startswith("SUGGESTION"):
             return int(resp.split()[1])
         return -1
 
-    def undo(self, doc_id):
-        st.session_state['edu_msg'] = "↩ Undo Operation: Stack LIFO Pop. Event ID retrieved. Hash Map Entry & Interval Tree Node removed & rebalanced."
-        self.send_command(f"UNDO {doc_id}")
+    def next_open(self, doc_id, from_time, duration):
+        # Earliest bookable start >= from_time, or -1
+        if self.scheduler:
+            return self.call("next_open", doc_id, from_time, duration)
+        resp = self.send_optional(f"NEXT_OPEN {doc_id} {from_time} {duration}")
+        if resp and resp.startswith("OPENING"):
+            return int(resp.split()[1])
+        # scheduler.exe has no NEXT_OPEN: ask SUGGEST day by day for a week
+        # (directly, so the render doesn't set the suggestion banner)
+        day = from_time // 1440
+        for d in range(day, day + 7):
+            resp = self.send_command(f"SUGGEST {doc_id} {duration} {d * 1440}")
+            if resp and resp.startswith("SUGGESTION") and int(resp.split()[1]) >= from_time:
+                return int(resp.split()[1])
+        return -1
+
+    def undo(self, doc_id, steps=1):
+        st.session_state['edu_msg'] = "↩ Undo Operation: Journal LIFO Pop. Inverse operation applied in place to Hash Map, Interval Tree & Heap."
+        if self.scheduler:
+            self.call("undo", doc_id, steps)
+            return
+        # Plain "UNDO doc" for a single step keeps scheduler.exe in sync
+        self.send_command(f"UNDO {doc_id}" if steps == 1 else f"UNDO {doc_id} {steps}")
+
+    def redo(self, doc_id, steps=1):
+        st.session_state['edu_msg'] = "↪ Redo Operation: Undone operation popped from the Redo Stack and re-applied."
+        if self.scheduler:
+            self.call("redo", doc_id, steps)
+            return
+        self.send_command(f"REDO {doc_id} {steps}")
 
     def get_events(self, doc_id):
+        if self.scheduler:
+            return [self.to_dict(e) for e in self.call("get_all", doc_id)]
         resp = self.send_command(f"GET {doc_id}")
         try:
             return json.loads(resp)
         except:
             return []
 
+    def iter_events(self, doc_id, start=0, end=None, page_size=PAGE_SIZE):
+        # Streams events in start order one GET_PAGE at a time, so the first rows render before the rest are fetched
+        if self.scheduler:
+            cursor = None
+            while True:
+                events, cursor = self.call("get_page", doc_id, start, cursor, page_size)
+                for e in events:
+                    if end is not None and e.start_time >= end:
+                        return
+                    yield self.to_dict(e)
+                if cursor is None:
+                    return
+
+        cursor = "-"
+        while True:
+            resp = self.send_optional(f"GET_PAGE {doc_id} {start} {cursor} {page_size}")
+            try:
+                page = json.loads(resp)
+            except:
+                # scheduler.exe has no GET_PAGE: fall back to one full GET
+                for e in sorted(self.get_events(doc_id), key=lambda x: x['start']):
+                    if e['start'] >= start and (end is None or e['start'] < end):
+                        yield e
+                return
+            for e in page["events"]:
+                if end is not None and e['start'] >= end:
+                    return
+                yield e
+            if page["next"] is None:
+                return
+            cursor = page["next"]
+
+    def get_archived(self, doc_id, start, end):
+        # Past days moved to the backend's cold store (scheduler.exe has none: ERROR -> [])
+        if self.scheduler:
+            return [self.to_dict(e) for e in self.call("get_cold", doc_id, start, end)]
+        resp = self.send_optional(f"COLD {doc_id} {start} {end}")
+        try:
+            return json.loads(resp)
+        except:
+            return []
+
+    def search(self, doc_id, prefix, start=None, end=None):
+        # Events of doc_id with a description word starting with each "_"-separated
+        # word of `prefix` (case-insensitive), optionally start <= e.start < end, in time order
+        window = (start, end) if start is not None else ()
+        if self.scheduler:
+            return [self.to_dict(e) for _, e in self.call("search", doc_id, prefix, *window)]
+        resp = self.send_optional(" ".join(["SEARCH", str(doc_id), prefix] + [str(t) for t in window]))
+        try:
+            return json.loads(resp)
+        except:
+            # scheduler.exe has no SEARCH: scan a full GET
+            words = [w for w in prefix.lower().split("_") if w]
+            return sorted((e for e in self.get_events(doc_id)
+                           if all(any(t.startswith(w) for t in e['desc'].lower().split("_")) for w in words)
+                           and (start is None or start <= e['start'] < end)),
+                          key=lambda e: e['start'])
+
+    def utilization(self, doc_id, from_day, to_day):
+        # Per-day {"day", "count", "minutes", "remaining"} for day ordinals from_day..to_day
+        if self.scheduler:
+            days, _, _ = self.call("utilization", doc_id, from_day, to_day)
+            return [{"day": d, "count": c, "minutes": m, "remaining": r} for d, c, m, r in days]
+        resp = self.send_optional(f"UTIL {doc_id} {from_day} {to_day}")
+        try:
+            return json.loads(resp)["days"]
+        except:
+            # scheduler.exe has no UTIL: count from a full GET
+            limit = self.limits.get(doc_id, 480)
+            days = {d: {"day": d, "count": 0, "minutes": 0, "remaining": limit} for d in range(from_day, to_day + 1)}
+            for e in self.get_events(doc_id):
+                d = days.get(e['start'] // 1440)
+                if d:
+                    d["count"] += 1
+                    d["minutes"] += e['duration']
+                    d["remaining"] -= e['duration']
+            return list(days.values())
+
     def check_alert(self, doc_id):
         now = time.localtime()
         # Calculate global minutes: ordinal * 1440 + minutes_of_day
         current_day_ordinal = date.today().toordinal()
         curr_mins = (current_day_ordinal * 1440) + (now.tm_hour * 60) + now.tm_min
+
+        if self.push_alerts:
+            # Subscribe once; afterwards alerts are pushed and no command is sent per render
+            if doc_id not in self.alerts:
+                if self.scheduler:
+                    self.call("watch", doc_id, ALERT_LEAD, curr_mins)
+                elif self.send_command(f"WATCH {doc_id} {ALERT_LEAD} {curr_mins}") != "OK":
+                    # scheduler.exe has no WATCH: fall back to polling
+                    self.push_alerts = False
+                    return self.check_alert(doc_id)
+                self.alerts.setdefault(doc_id, {})
+            pending = self.alerts[doc_id]
+            for eid, start in list(pending.items()):
+                if start < curr_mins:
+                    pending.pop(eid, None)
+            return min(pending.values()) - curr_mins if pending else -1
         
         resp = self.send_command(f"ALERT {doc_id} {curr_mins}")
         try:
@@ -101,12 +342,37 @@ class SchedulerBackend:
             return -1
 
     def delete_event(self, doc_id, event_id):
-        st.session_state['edu_msg'] = " Deletion: Removed from Hash Map O(1) & Heap O(log n). Interval Tree Rebuilt."
+        st.session_state['edu_msg'] = " Deletion: Removed from Hash Map O(1), Heap & Interval Tree in place. Recorded in Journal for Undo."
+        if self.scheduler:
+            self.call("delete_event", doc_id, event_id)
+            return
         self.send_command(f"DELETE {doc_id} {event_id}")
 
+    def move_event(self, doc_id, event_id, new_start, new_duration=None):
+        # One atomic MOVE: same id, the old slot is never briefly free
+        if self.scheduler:
+            resp, result = self.call("move_event", doc_id, event_id, new_start, new_duration)
+            if resp == "COLLISION":
+                resp = "COLLISION " + " ".join(f"{e.start_time} {e.end_time}" for e in result)
+        else:
+            dur = f" {new_duration}" if new_duration is not None else ""
+            resp = self.send_command(f"MOVE {doc_id} {event_id} {new_start}{dur}")
+        if resp == "OK":
+            st.session_state['edu_msg'] = " Move: Event re-keyed in place in Heap & Interval Tree after an overlap check that ignores itself. Recorded in Journal for Undo."
+        return resp
+
     def set_limit(self, doc_id, limit):
+        self.limits[doc_id] = limit
+        if self.scheduler:
+            self.call("set_limit", doc_id, limit)
+            return
         self.send_command(f"SET_LIMIT {doc_id} {limit}")
 
+    @staticmethod
+    def to_dict(e):
+        # Same shape as the GET JSON
+        return {"id": e.id, "start": e.start_time, "duration": e.duration, "type": e.type, "break": e.break_type, "desc": e.description}
+
 
 @st.cache_resource
 def get_backend():
@@ -116,35 +382,107 @@ backend = get_backend()
 
 
 # --- Auth System ---
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
+# Accounts live in SQLite (username is UNIQUE, so lookups use its index) and
+# each signup is one transaction instead of a rewrite of users.json. Passwords
+# are stored as pbkdf2_sha256$iterations$salt$hash; raising PASSWORD_ITERATIONS
+# re-hashes old entries on their next successful login. An existing users.json
+# is imported once.
+class UserStore:
+    def __init__(self, db_path=USERS_DB, legacy_path=USERS_FILE):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.db.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, username TEXT NOT NULL UNIQUE, password TEXT NOT NULL)")
+        if os.path.exists(legacy_path):
+            self.import_json(legacy_path)
+
+    def import_json(self, path):
+        # users.json holds plaintext passwords: it is deleted once every account in
+        # it is in the db. Legacy ids started at 0 like new signups, so an id that is
+        # already taken gets a fresh one instead of dropping the account.
+        with open(path, "r") as f:
+            users = json.load(f)
+        hashed = {username: hash_password(u["password"]) for username, u in users.items()}
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                for username, u in users.items():
+                    if self.db.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone():
+                        continue
+                    if self.db.execute("SELECT 1 FROM users WHERE id = ?", (u["id"],)).fetchone():
+                        self.db.execute("INSERT INTO users (id, username, password) VALUES ((SELECT MAX(id) + 1 FROM users), ?, ?)",
+                                        (username, hashed[username]))
+                    else:
+                        self.db.execute("INSERT INTO users (id, username, password) VALUES (?, ?, ?)",
+                                        (u["id"], username, hashed[username]))
+            except:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+            imported = all(self.db.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone()
+                           for username in users)
+        if imported:
+            os.remove(path)
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def register(self, username, password):
+        hashed = hash_password(password) # Outside the lock: this is the slow part
+        with self.lock:
+            # One transaction: the cap check, new id and insert can't interleave with another signup
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                if self.db.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone():
+                    result = "Exists"
+                # STRICT LIMIT: Max 2 Doctors
+                elif self.db.execute("SELECT COUNT(*) FROM users").fetchone()[0] >= MAX_ACCOUNTS:
+                    result = "Full"
+                else:
+                    # Ids index per-doctor backend state, so never reuse one
+                    self.db.execute("INSERT INTO users (id, username, password) VALUES ((SELECT COALESCE(MAX(id), -1) + 1 FROM users), ?, ?)",
+                                    (username, hashed))
+                    result = True
+            except:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+            return result
+
+    def authenticate(self, username, password):
+        with self.lock:
+            row = self.db.execute("SELECT id, password FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None or not check_password(password, row[1]):
+            return None
+        if int(row[1].split("$")[1]) != PASSWORD_ITERATIONS:
+            hashed = hash_password(password) # Outside the lock, as in register
+            with self.lock:
+                self.db.execute("UPDATE users SET password = ? WHERE id = ?", (hashed, row[0]))
+        return row[0]
+
+
+def hash_password(password, salt=None, iterations=None):
+    salt = salt or secrets.token_hex(16)
+    iterations = iterations or PASSWORD_ITERATIONS
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("ascii"), iterations)
+    return f"pbkdf2_sha256${iterations}${salt}${digest.hex()}"
+
+def check_password(password, stored):
+    _, iterations, salt, _ = stored.split("$")
+    return hmac.compare_digest(hash_password(password, salt, int(iterations)), stored)
+
+
+@st.cache_resource
+def get_user_store():
+    return UserStore()
 
-def save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f)
+user_store = get_user_store()
 
 def register_user(username, password):
-    users = load_users()
-    if username in users:
-        return "Exists"
-    
-    # STRICT LIMIT: Max 2 Doctors
-    if len(users) >= 2: 
-        return "Full"
-    
-    new_id = len(users)
-    users[username] = {"password": password, "id": new_id}
-    save_users(users)
-    return True
+    return user_store.register(username, password)
 
 def authenticate(username, password):
-    users = load_users()
-    if username in users and users[username]["password"] == password:
-        return users[username]["id"]
-    return None
+    return user_store.authenticate(username, password)
 
 # --- Page Config & Styling ---
 st.set_page_config(page_title="MediSync Elite", layout="wide", page_icon="🩺")
@@ -394,19 +732,38 @@ else:
                  backend.set_limit(doc_idx, limit_hours * 60)
                  st.success(f"Limit set to {limit_hours} hours!")
 
+        with st.expander("🔎 Find Patient"):
+             query = st.text_input("Name starts with", key="search_query")
+             # Same normalization as add_event; every word must start a word of the description
+             words = "".join(c for c in query if c.isalnum() or c in " -_").replace("-", " ").replace("_", " ").lower().split()
+             if words:
+                 hits = backend.search(doc_idx, "_".join(words))
+                 # Reruns keep the box filled; only a new query is a user action
+                 if st.session_state.get('last_search') != words:
+                     st.session_state.last_search = words
+                     st.session_state['edu_msg'] = " Search: Prefix range in a sorted token table, per-doctor runs merged by start time."
+                 if not hits:
+                     st.caption("No matching appointments.")
+                 for e in hits:
+                     when = date.fromordinal(e['start'] // 1440).strftime('%b %d')
+                     st.markdown(f"**{when} {(e['start'] % 1440) // 60:02d}:{e['start'] % 60:02d}** · {e['desc'].replace('_', ' ')}")
+
         
     with col_view:
         # Calculate Stats for the Selected Date
         current_ord = sel_d.toordinal()
-        all_events = backend.get_events(doc_idx)
-        day_events = [e for e in all_events if (e['start'] // 1440) == current_ord]
-        
-        count = len(day_events)
+        count = backend.utilization(doc_idx, current_ord, current_ord)[0]['count']
         slots_left = 7 - count
         
-        # Next Opening (Mock logic or use suggest)
-        # We can just show counts for now as "Next Opening" requires complex query
-        
+        # Next Opening: from now, or from the start of a future selected day
+        now = time.localtime()
+        from_time = max(date.today().toordinal() * 1440 + now.tm_hour * 60 + now.tm_min, current_ord * 1440)
+        opening = backend.next_open(doc_idx, from_time, OPENING_DURATION)
+        if opening >= 0:
+            opening_text = f"{date.fromordinal(opening // 1440).strftime('%b %d')} {(opening % 1440) // 60:02d}:{opening % 60:02d}"
+        else:
+            opening_text = "NONE"
+
         st.markdown(f"""
         <div class='glass-card' style='display: flex; justify-content: space-around; align-items: center; padding: 1.2rem;'>
             <div style="text-align: center;">
@@ -425,6 +782,11 @@ else:
                     {"FULLY BOOKED" if slots_left == 0 else "ACCEPTING"}
                 </div>
             </div>
+             <div style="width: 1px; height: 40px; background: rgba(255,255,255,0.1);"></div>
+            <div style="text-align: center;">
+                <div style="color: #8892b0; font-size: 0.9em; margin-bottom: 5px;">⏭️ NEXT OPENING</div>
+                <div style="font-size: 1.2em; font-weight: bold; color: #fff;">{opening_text}</div>
+            </div>
         </div>
         """, unsafe_allow_html=True)
 
@@ -489,18 +851,24 @@ else:
                     st.error("Limit Reached: Max 7 events per day.")
                 elif res == "TIME_LIMIT":
                      st.error("Time Limit Exceeded: You have reached your daily workload limit.")
+                elif res == "ARCHIVED":
+                    st.error("This day has been archived and can no longer be booked.")
                 elif res and res.startswith("COLLISION"):
 
+                    # COLLISION s1 e1 [s2 e2 ...]: every clashing interval, earliest first
                     parts = res.split()
-                    c_start, c_end = int(parts[1]), int(parts[2])
-                    
-                    # Convert Global Collision Time back to Local for display
-                    c_h = (c_start % 1440) // 60
-                    c_m = (c_start % 1440) % 60
-                    c_end_h = (c_end % 1440) // 60
-                    c_end_m = (c_end % 1440) % 60
+                    clashes = []
+                    for k in range(1, len(parts) - 1, 2):
+                        c_start, c_end = int(parts[k]), int(parts[k + 1])
+                        
+                        # Convert Global Collision Time back to Local for display
+                        c_h = (c_start % 1440) // 60
+                        c_m = (c_start % 1440) % 60
+                        c_end_h = (c_end % 1440) // 60
+                        c_end_m = (c_end % 1440) % 60
+                        clashes.append(f"{c_h:02d}:{c_m:02d} - {c_end_h:02d}:{c_end_m:02d}")
                     
-                    st.session_state.collision_display = f"{c_h:02d}:{c_m:02d} - {c_end_h:02d}:{c_end_m:02d}"
+                    st.session_state.collision_display = ", ".join(clashes)
                     
                     day_start_mins = current_day_ordinal * 1440
                     sug_time = backend.suggest(doc_idx, duration, day_start_mins)
@@ -560,10 +928,16 @@ else:
                      st.rerun()
 
         st.markdown("---")
-        if st.button(" Undo Last Action"):
-            backend.undo(doc_idx)
-            # st.toast("Last action undone") - Removed in favor of edu_msg
-            st.rerun()
+        u_col, r_col = st.columns(2)
+        with u_col:
+            if st.button(" Undo Last Action"):
+                backend.undo(doc_idx)
+                # st.toast("Last action undone") - Removed in favor of edu_msg
+                st.rerun()
+        with r_col:
+            if st.button(" Redo"):
+                backend.redo(doc_idx)
+                st.rerun()
 
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -575,8 +949,8 @@ else:
         start_of_week = sel_d - timedelta(days=sel_d.weekday())
         end_of_week = start_of_week + timedelta(days=6)
         
-        # Fetch ALL events
-        all_events = backend.get_events(doc_idx)
+        # Per-day counts for the whole week in one UTIL call (prefix sums in the backend)
+        week_util = backend.utilization(doc_idx, start_of_week.toordinal(), end_of_week.toordinal())
         
         # --- Day Slot Matrix ---
         st.markdown("### Weekly Overview")
@@ -591,7 +965,7 @@ else:
             is_selected = (curr_d == sel_d)
             
             # Count events for this day
-            ev_count = sum(1 for e in all_events if (e['start'] // 1440) == curr_ord)
+            ev_count = week_util[i]['count']
             status_color = "#4Caf50" if ev_count < 7 else "#f44336" # Green if open, Red if full
             
             border_style = "2px solid #00c6ff" if is_selected else "1px solid rgba(255,255,255,0.1)"
@@ -607,17 +981,42 @@ else:
                 </div>
                 """, unsafe_allow_html=True)
 
+        # --- Month Heatmap ---
+        with st.expander("Month Heatmap"):
+            month_start = sel_d.replace(day=1)
+            next_month = (month_start + timedelta(days=32)).replace(day=1)
+            month_util = backend.utilization(doc_idx, month_start.toordinal(), next_month.toordinal() - 1)
+            # Pad to start on Monday, then one row per week
+            cells = [None] * month_start.weekday() + month_util
+            for w in range(0, len(cells), 7):
+                week_cols = st.columns(7)
+                for col, u in zip(week_cols, cells[w:w + 7]):
+                    if u is None:
+                        continue
+                    limit = u['minutes'] + u['remaining']
+                    load = u['minutes'] / limit if limit > 0 else 1.0
+                    with col:
+                        st.markdown(f"""
+                        <div style="text-align: center; border-radius: 6px; padding: 6px 2px; background: rgba(255, 59, 48, {0.08 + 0.6 * min(load, 1.0):.2f});">
+                            <div style="font-weight: bold;">{date.fromordinal(u['day']).day}</div>
+                            <div style="font-size: 0.7em; color: #ddd;">{u['count']}/7 · {u['minutes'] // 60}h{u['minutes'] % 60:02d}</div>
+                        </div>
+                        """, unsafe_allow_html=True)
+
         st.markdown("---")
         st.markdown(f"###  Schedule for {sel_d.strftime('%A, %b %d')}")
         
-        # Filter for Selected Day
-        day_events = [e for e in all_events if (e['start'] // 1440) == current_day_ordinal]
-        day_events.sort(key=lambda x: x['start'])
-        
-        if not day_events:
-            st.markdown("<div style='text-align:center; padding: 40px; color: #666;'>No events scheduled.<br>Select a slot to add one.</div>", unsafe_allow_html=True)
+        # Stream the selected day page by page; a past day may already be in the cold store
+        day_start_mins = current_day_ordinal * 1440
+        day_events = backend.iter_events(doc_idx, day_start_mins, day_start_mins + 1440)
+        if sel_d < date.today():
+            # Archived rows are read-only: the backend can't delete or move cold events
+            archived = (dict(e, archived=True) for e in backend.get_archived(doc_idx, day_start_mins, day_start_mins + 1440))
+            day_events = itertools.chain(archived, day_events)
         
+        shown = 0
         for e in day_events:
+            shown += 1
             # Local Time
             local_start = e['start'] % 1440
             start_h = local_start // 60
@@ -657,13 +1056,40 @@ else:
             </div>
             """, unsafe_allow_html=True)
             
+            if e.get('archived'):
+                st.caption("Archived · read-only")
+                continue
+
             # Delete Button (using columns to align right below the card or inside it? Inside is hard with HTML injection)
             # Alternative: Render a small st.button below each card
             d_col1, d_col2 = st.columns([0.85, 0.15])
+            with d_col1:
+                with st.expander("Reschedule"):
+                    m_col1, m_col2, m_col3 = st.columns(3)
+                    with m_col1:
+                        m_hour = st.number_input("Hour", 0, 23, start_h, key=f"mv_h_{e['id']}")
+                    with m_col2:
+                        m_min = st.number_input("Minute", 0, 59, start_m, step=15, key=f"mv_m_{e['id']}")
+                    with m_col3:
+                        m_dur = st.number_input("Duration", 15, 120, max(15, min(e['duration'], 120)), step=15, key=f"mv_d_{e['id']}")
+                    if st.button("Move", key=f"mv_{e['id']}"):
+                        res = backend.move_event(doc_idx, e['id'], current_day_ordinal * 1440 + m_hour * 60 + m_min, m_dur)
+                        if res == "OK":
+                            st.rerun()
+                        elif res and res.startswith("COLLISION"):
+                            st.error("Collision: that time overlaps another event.")
+                        elif res == "MAX_EVENTS":
+                            st.error("Limit Reached: Max 7 events per day.")
+                        elif res == "TIME_LIMIT":
+                            st.error("Time Limit Exceeded: You have reached your daily workload limit.")
+                        else:
+                            st.error("This event can't be moved.")
             with d_col2:
                  if st.button("Delete", key=f"del_{e['id']}", help="Delete this event"):
                      backend.delete_event(doc_idx, e['id'])
                      st.rerun()
 
+        if not shown:
+            st.markdown("<div style='text-align:center; padding: 40px; color: #666;'>No events scheduled.<br>Select a slot to add one.</div>", unsafe_allow_html=True)
             
         st.markdown("</div>", unsafe_allow_html=True)